@@ -10,9 +10,9 @@ class Bank(mesa.Agent):
                  bank_params):
         super().__init__(unique_id, model)
         self.cb = central_bank
-        self.ltv = bank_params['ltv']
-        self.mu_dep = bank_params['mu_dep']
-        self.mu_loan = bank_params['mu_loan']
+        self.ltv = bank_params.ltv
+        self.mu_dep = bank_params.mu_dep
+        self.mu_loan = bank_params.mu_loan
 
     def update_rates(self):
         """Bank updates rates every period based on previous Central Bank rate.
@@ -1,7 +1,7 @@
 import mesa
-from agents.household import Household
 import numpy as np
-from random import choice
+
+from employment import WageBook
 
 
 class Firm(mesa.Agent):
@@ -17,41 +17,50 @@ class Firm(mesa.Agent):
         super().__init__(unique_id, model)
         self.cb = central_bank
         self.output = self.model.num_agents
-        self.adj_p = firm_params['adj_p']
-        self.adj_w = firm_params['adj_w']
-        self.nu_2 = firm_params['nu_2']
+        self.adj_p = firm_params.adj_p
+        self.adj_w = firm_params.adj_w
+        self.nu_2 = firm_params.nu_2
         self.nu_1 = self.nu_2
-        self.sens = firm_params['sens']
+        self.sens = firm_params.sens
 
-        self.wages = {}
+        self.employment = model.employment
+        self.wage_book = WageBook(self.model.num_agents)
 
         self.prev_price = self.price = 1
 
     def _init_employment(self):
         """Randomly initialize employment in the model."""
-        N_empl = np.random.randint(
+        N_empl = self.model.rng.integers(
             self.model.num_agents // 2, self.model.num_agents
             )
-        empl = []
-        for _ in range(N_empl):
-            new_e = self.model.unemployed.pop()
-            empl.append(new_e)
+        empl = [self.employment.hire_random() for _ in range(N_empl)]
 
         self.base_wage = self.output / N_empl
+        self.wage_book.set_base_wage(self.base_wage)
         self._init_wages(empl, empl)
 
+    @property
+    def wages(self) -> np.ndarray:
+        """Wage of every household, zero for the unemployed."""
+        return self.wage_book.wages
+
+    def _productivity(self, employee: int) -> float:
+        """Productivity of the household with the given index."""
+        if self.model.vectorized:
+            return self.model.households.productivity[employee]
+        return self.model.households[employee].productivity
+
     def _init_wages(self,
-                    curr_employees: list[Household],
-                    new_employees: list[Household]
-                    ) -> dict[Household, int]:
+                    curr_employees: list[int],
+                    new_employees: list[int]
+                    ) -> dict[int, int]:
         """Initialize wages for hired employees:
         Each period we compute a baseline currently paid per
         'productivity unit' and then multiply by employee productivity
-        to get their wage. Then we add the employee and their wage to dict.
+        to get their wage. Then we add the employee to the wage book.
         """
-
         for e in new_employees:
-            self.wages[e] = self.base_wage * e.productivity
+            self.wage_book.add(e, self._productivity(e))
 
     def det_state(self) -> int:
         """Determine if there is excess demand or excess
@@ -70,14 +79,14 @@ class Firm(mesa.Agent):
 
         if self.state:
             self.price *= (1 + self.sens * self.model.inf_expec) * (
-                1 + self.adj_p * np.random.uniform(0, 1))
+                1 + self.adj_p * self.model.rng.uniform(0, 1))
         else:
             self.price *= (1 + self.sens * self.model.inf_expec) * (
-                1 - self.adj_p * np.random.uniform(0, 1))
+                1 - self.adj_p * self.model.rng.uniform(0, 1))
 
     def upd_output(self, gap):
         # update propensity to increase output and wages
-        if not self.model.unemployed:
+        if not self.employment.n_unemployed:
             self.nu_1 = 0
         else:
             self.nu_1 = self.cb.rate * self.nu_2
@@ -93,41 +102,39 @@ class Firm(mesa.Agent):
 
         If there is excess demand in the economy, the firm hires
         proportionally to gap. In case of excess supply it fires.
-        New employees are taken randomly from the set of unemployed workers
-        in the model. Employees are fired randomly also.
+        New employees are taken randomly from the pool of unemployed workers
+        in the model's employment registry. Employees are fired randomly also.
         """
-        self.base_wage = self.output / sum([e.productivity for e in self.wages.keys()])
+        self.base_wage = self.output / self.wage_book.total_productivity
 
         if self.state:
             self.base_wage *= (1 + self.sens * (1 - self.nu_1) * (
-                    1 - self.model.unemployment) * np.random.uniform(0, 1)) * (
+                    1 - self.model.unemployment) * self.model.rng.uniform(0, 1)) * (
                     1 + self.sens * self.model.inf_expec)
+            self.wage_book.set_base_wage(self.base_wage)
 
-            for e in self.wages.keys():
-                self.wages[e] = self.base_wage * e.productivity
-
-            n_to_hire = int(self.nu_1 * -gap / self.output * len(self.wages))
+            n_to_hire = int(
+                self.nu_1 * -gap / self.output * self.employment.n_employed)
             new_empl = []
             for _ in range(n_to_hire):
-                if not self.model.unemployed:
+                if not self.employment.n_unemployed:
                     break
-                new_e = self.model.unemployed.pop()
-                new_empl.append(new_e)
-            self._init_wages(list(self.wages.keys()), new_empl)
+                new_empl.append(self.employment.hire_random())
+            self._init_wages(self.employment.employed_ids(), new_empl)
 
         else:
             self.base_wage *= (
-                    1 - self.nu_2 * self.model.unemployment * np.random.uniform(0, 1)
+                    1 - self.nu_2 * self.model.unemployment * self.model.rng.uniform(0, 1)
                     ) * (1 + self.sens * self.model.inf_expec)
+            self.wage_book.set_base_wage(self.base_wage)
 
-            for e in self.wages.keys():
-                self.wages[e] = self.base_wage * e.productivity
-
-            n_to_fire = int(self.nu_2 * gap / self.output * len(self.wages))
+            n_to_fire = int(
+                self.nu_2 * gap / self.output * self.employment.n_employed)
             for _ in range(n_to_fire):
-                fired = choice(list(self.wages))
-                self.wages.pop(fired)
-                self.model.unemployed.add(fired)
+                if not self.employment.n_employed:
+                    break
+                fired = self.employment.fire_random()
+                self.wage_book.remove(fired)
 
     def step(self):
         gap = self.det_state()
@@ -1,33 +1,51 @@
 import mesa
 import numpy as np
 
+from config import HouseholdConfig
+
+
+def draw_initial_state(rng: np.random.Generator,
+                       size: int | tuple[int, ...],
+                       hh_params: HouseholdConfig
+                       ) -> dict[str, np.ndarray]:
+    """Draw initial productivity, wealth and desired consumption of all
+    households at once, household i gets element i of every array.
+    """
+    return {
+        'productivity': rng.normal(1, hh_params.sigma, size),
+        'wealth': rng.normal(hh_params.mean_w, hh_params.sigma_w, size),
+        'desired_cons': rng.normal(hh_params.mu_k, hh_params.sigma_k, size)
+        }
+
 
 class Household(mesa.Agent):
     """Household agent."""
     def __init__(self,
                  unique_id,
                  model,
+                 index,
                  bank,
                  firm,
-                 hh_params
+                 hh_params,
+                 initial_state
                  ):
         super().__init__(unique_id, model)
+        self.index = index  # position in the model's household arrays
         self.bank = bank
         self.firm = firm
-        self.ptc = hh_params['ptc']
-        self.sens = hh_params['sens']
-        self.mu_k = hh_params['mu_k']
-        self.sigma_k = hh_params['sigma_k']
-        self.mu_1 = hh_params['mu_1']
-        self.mu_2 = hh_params['mu_2']
-        self.sigma = hh_params['sigma']
-        self.productivity = np.random.normal(1, self.sigma)
-        self.wealth = np.random.normal(
-            hh_params['mean_w'], hh_params['sigma_w']
-            )
+        self.aggregates = model.aggregates
+        self.ptc = hh_params.ptc
+        self.sens = hh_params.sens
+        self.mu_k = hh_params.mu_k
+        self.sigma_k = hh_params.sigma_k
+        self.mu_1 = hh_params.mu_1
+        self.mu_2 = hh_params.mu_2
+        self.sigma = hh_params.sigma
+        self.productivity = float(initial_state['productivity'][index])
+        self.wealth = float(initial_state['wealth'][index])
         self.income = 0
-        self.desired_cons = np.random.normal(self.mu_k, self.sigma_k)
-        self.investment = hh_params['inv_cost']
+        self.desired_cons = float(initial_state['desired_cons'][index])
+        self.investment = hh_params.inv_cost
         self.demand = self.desired_cons
 
     def update_ptc(self):
@@ -43,21 +61,23 @@ class Household(mesa.Agent):
 
     def plan_consumption(self):
         """Household plans its consumption based on expected income (which is
-        just income of the previous period) and adds a random component.
+        just income of the previous period) and adds a random component,
+        taken from the consumption shocks the model draws for all households.
         """
-        self.desired_cons = self.ptc * self.income + np.random.normal(
-            self.mu_k, self.sigma_k)
+        self.desired_cons = self.ptc * self.income + (
+            self.mu_k + self.sigma_k * self.model.cons_shocks[self.index])
 
     def get_paid(self):
         """Household receives its wage from firm if they're employed
         in the current period.
         """
-        if self in self.model.unemployed:
-            self.income = 0
+        if self.model.employment.employed[self.index]:
+            self.income = self.firm.wages[self.index]
         else:
-            self.income = self.firm.wages[self]
+            self.income = 0
 
         self.wealth += self.income
+        self.aggregates.wealth += self.income
 
     def credit_operations(self) -> tuple[int, int]:
         """Household determines whether to save or borrow based on
@@ -83,13 +103,18 @@ class Household(mesa.Agent):
         """Household invests a fixed amount to increase its productivity.
         If household is credit constrained it may choose not to invest.
         """
+        shock = self.sigma * self.model.prod_shocks[self.index]
         if self.investment != 0:
-            self.productivity *= (1 + np.random.normal(self.mu_1, self.sigma))
+            self.productivity *= (1 + self.mu_1 + shock)
         else:
-            self.productivity *= (1 + np.random.normal(self.mu_2, self.sigma))
+            self.productivity *= (1 + self.mu_2 + shock)
+
+        if self.model.employment.employed[self.index]:
+            self.firm.wage_book.update_productivity(self.index, self.productivity)
 
     def consume(self, given_credit: int, interest: int):
         """Household spends wealth on consumption."""
+        prev_demand = self.demand
         if given_credit <= 0:  # hh is a saver and can afford desired cons lvl
             self.demand = self.desired_cons
         else:  # hh is a borrower and may be credit constrained
@@ -97,9 +122,20 @@ class Household(mesa.Agent):
                 self.desired_cons,
                 self.wealth + given_credit + interest - self.investment
                 )
+        self.aggregates.demand += self.demand - prev_demand
 
     def update_wealth(self, interest: int):
-        self.wealth += interest - self.demand
+        change = interest - self.demand
+        self.wealth += change
+        self.aggregates.wealth += change
+
+    @classmethod
+    def step_batch(cls, households: list['Household']):
+        """Step all households, called once per step by the scheduler
+        instead of dispatching every household separately.
+        """
+        for household in households:
+            household.step()
 
     def step(self):
         self.plan_consumption()
@@ -0,0 +1,72 @@
+import mesa
+import numpy as np
+
+from kernels import ptc_factor, step_households, step_households_vectorized
+
+
+class HouseholdPopulation(mesa.Agent):
+    """All households of the economy stored as a struct of arrays.
+
+    Used by the vectorized engine instead of one Household agent per
+    household: every stage of Household.step is run as one batched
+    operation over the whole population, see
+    kernels.step_households_vectorized. Household i corresponds to
+    the agent with unique_id + i in the object engine. The model's
+    aggregates are set to exact sums after every batch, as a batch passes
+    over all households anyway.
+
+    With compiled=True a step runs all stages in one pass of the fused
+    kernels.step_households loop instead of one batched operation per
+    stage.
+    """
+    def __init__(self,
+                 unique_id,
+                 model,
+                 num_households,
+                 bank,
+                 firm,
+                 hh_params,
+                 initial_state,
+                 compiled=False
+                 ):
+        super().__init__(unique_id, model)
+        self.bank = bank
+        self.firm = firm
+        self.size = num_households
+        self.compiled = compiled
+
+        self.sens = hh_params.sens
+        self.mu_k = hh_params.mu_k
+        self.sigma_k = hh_params.sigma_k
+        self.mu_1 = hh_params.mu_1
+        self.mu_2 = hh_params.mu_2
+        self.sigma = hh_params.sigma
+
+        self.ptc = np.full(num_households, float(hh_params.ptc))
+        self.productivity = initial_state['productivity'].copy()
+        self.wealth = initial_state['wealth'].copy()
+        self.income = np.zeros(num_households)
+        self.desired_cons = initial_state['desired_cons'].copy()
+        self.investment = np.full(num_households, float(hh_params.inv_cost))
+        self.demand = self.desired_cons.copy()
+
+    def step(self):
+        """All stages of Household.step for the whole population, one
+        batched NumPy operation per stage, or with compiled=True in one
+        pass of the fused kernel.
+        """
+        firm, bank, model = self.firm, self.bank, self.model
+        kernel = step_households if self.compiled else step_households_vectorized
+        wage_book = firm.wage_book
+        demand, wealth, total_productivity = kernel(
+            self.ptc, self.productivity, self.wealth, self.income,
+            self.desired_cons, self.investment, self.demand,
+            model.employment.employed, wage_book.wages,
+            wage_book.productivity, model.cons_shocks, model.prod_shocks,
+            wage_book.total_productivity, self.mu_k, self.sigma_k, self.mu_1,
+            self.mu_2, self.sigma, bank.ltv, bank.r_loan, bank.r_dep,
+            ptc_factor(self.sens, model.inf_expec, bank.r_dep,
+                       firm.prev_price, firm.price))
+        wage_book.total_productivity = total_productivity
+        model.aggregates.demand = demand
+        model.aggregates.wealth = wealth
@@ -0,0 +1,186 @@
+import multiprocessing
+import weakref
+from multiprocessing import shared_memory
+
+import mesa
+import numpy as np
+
+from kernels import (NUMBA_AVAILABLE, ptc_factor, step_households,
+                     step_households_vectorized)
+
+# Arrays of the households and the firm's per-household arrays that the
+# shard workers read or write, all in one shared memory block
+HOUSEHOLD_ARRAYS = ('ptc', 'productivity', 'wealth', 'income',
+                    'desired_cons', 'investment', 'demand')
+SHARED_ARRAYS = {**{name: np.float64 for name in HOUSEHOLD_ARRAYS},
+                 'wages': np.float64,
+                 'wage_productivity': np.float64,
+                 'employed': np.bool_}
+
+
+def _layout(size: int) -> tuple[dict[str, int], int]:
+    """Byte offset of every shared array, 8-byte aligned, and total size."""
+    offsets, nbytes = {}, 0
+    for name, dtype in SHARED_ARRAYS.items():
+        offsets[name] = nbytes
+        nbytes += -(-size * np.dtype(dtype).itemsize // 8) * 8
+    return offsets, nbytes
+
+
+def _views(buffer, size: int) -> dict[str, np.ndarray]:
+    offsets, _ = _layout(size)
+    return {name: np.ndarray(size, dtype=dtype, buffer=buffer,
+                             offset=offsets[name])
+            for name, dtype in SHARED_ARRAYS.items()}
+
+
+def _shard_worker(conn, shm_name: str, size: int, start: int, stop: int,
+                  seed: np.random.SeedSequence):
+    """Step households start to stop whenever the coordinator sends the
+    step's scalars, and send back the shard's totals.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arrays = {name: values[start:stop]
+              for name, values in _views(shm.buf, size).items()}
+    rng = np.random.default_rng(seed)
+    kernel = step_households if NUMBA_AVAILABLE else step_households_vectorized
+    try:
+        while (scalars := conn.recv()) is not None:
+            cons_shocks = rng.standard_normal(stop - start)
+            prod_shocks = rng.standard_normal(stop - start)
+            conn.send(kernel(
+                arrays['ptc'], arrays['productivity'], arrays['wealth'],
+                arrays['income'], arrays['desired_cons'],
+                arrays['investment'], arrays['demand'], arrays['employed'],
+                arrays['wages'], arrays['wage_productivity'],
+                cons_shocks, prod_shocks, 0., *scalars))
+    finally:
+        del arrays
+        shm.close()
+
+
+def _shutdown(connections, processes, shm):
+    for conn in connections:
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    shm.close()
+    shm.unlink()
+
+
+class ShardedPopulation(mesa.Agent):
+    """All households split into shards stepped by worker processes.
+
+    Household arrays, the firm's wages and wage book productivity and the
+    employment mask live in shared memory. The central bank, bank, firm
+    and employment registry stay in the coordinating process, which also
+    makes every hire and fire draw, across all shards. Every step the
+    coordinator sends the step's rates, prices and policy scalars to all
+    workers, each worker steps its shard with the fused household kernel
+    (Numba if installed, NumPy otherwise) and returns its demand, wealth
+    and productivity change totals, which the coordinator adds up.
+
+    Shocks are drawn by each worker from its own generator spawned from
+    the model's seed, so results depend on the seed and the number of
+    shards, and differ from the other engines by their random streams.
+
+    Attributes such as wealth are the full shared arrays, so reporters
+    work unchanged, but reading them is O(N) in the coordinator. For very
+    large populations record no households (agent_households=[]) and
+    sample inequality (inequality_sample).
+    """
+    def __init__(self,
+                 unique_id,
+                 model,
+                 num_households,
+                 bank,
+                 firm,
+                 hh_params,
+                 initial_state,
+                 shards: int,
+                 seed: np.random.SeedSequence
+                 ):
+        super().__init__(unique_id, model)
+        self.bank = bank
+        self.firm = firm
+        self.size = num_households
+        self.shards = shards
+
+        self.sens = hh_params.sens
+        self.mu_k = hh_params.mu_k
+        self.sigma_k = hh_params.sigma_k
+        self.mu_1 = hh_params.mu_1
+        self.mu_2 = hh_params.mu_2
+        self.sigma = hh_params.sigma
+
+        _, nbytes = _layout(num_households)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        arrays = _views(self._shm.buf, num_households)
+        for name in HOUSEHOLD_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.ptc[:] = hh_params.ptc
+        self.productivity[:] = initial_state['productivity']
+        self.wealth[:] = initial_state['wealth']
+        self.income[:] = 0
+        self.desired_cons[:] = initial_state['desired_cons']
+        self.investment[:] = hh_params.inv_cost
+        self.demand[:] = initial_state['desired_cons']
+
+        # the firm and the registry write these, the workers read them
+        wage_book = firm.wage_book
+        arrays['wages'][:] = wage_book.wages
+        arrays['wage_productivity'][:] = wage_book.productivity
+        arrays['employed'][:] = model.employment.employed
+        wage_book.wages = arrays['wages']
+        wage_book.productivity = arrays['wage_productivity']
+        model.employment.employed = arrays['employed']
+
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+        context = multiprocessing.get_context(method)
+        bounds = np.linspace(0, num_households, shards + 1).astype(int)
+        self._connections, self._processes = [], []
+        for start, stop, shard_seed in zip(bounds[:-1], bounds[1:],
+                                           seed.spawn(shards)):
+            conn, worker_conn = context.Pipe()
+            process = context.Process(
+                target=_shard_worker,
+                args=(worker_conn, self._shm.name, num_households,
+                      int(start), int(stop), shard_seed),
+                daemon=True)
+            process.start()
+            self._connections.append(conn)
+            self._processes.append(process)
+        self._finalizer = weakref.finalize(self, _shutdown, self._connections,
+                                           self._processes, self._shm)
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        self._finalizer()
+
+    def __deepcopy__(self, memo):
+        raise TypeError("a sharded population cannot be copied, "
+                        "fork or checkpoint a model with another engine")
+
+    def step(self):
+        model, bank, firm = self.model, self.bank, self.firm
+        scalars = (self.mu_k, self.sigma_k, self.mu_1, self.mu_2, self.sigma,
+                   bank.ltv, bank.r_loan, bank.r_dep,
+                   ptc_factor(self.sens, model.inf_expec, bank.r_dep,
+                              firm.prev_price, firm.price))
+        for conn in self._connections:
+            conn.send(scalars)
+
+        demand = wealth = productivity_change = 0.
+        for conn in self._connections:
+            shard_demand, shard_wealth, shard_change = conn.recv()
+            demand += shard_demand
+            wealth += shard_wealth
+            productivity_change += shard_change
+        firm.wage_book.total_productivity += productivity_change
+        model.aggregates.demand = demand
+        model.aggregates.wealth = wealth
@@ -0,0 +1,36 @@
+class Aggregates:
+    """Population totals of a model, kept up to date by delta.
+
+    Households add the change of their demand and wealth whenever they
+    change them, so reading aggregate demand or total wealth is O(1)
+    instead of a pass over all households. Total employed productivity
+    and the unemployment count are kept the same way by the wage book
+    and the employment registry and are exposed here as well.
+
+    Sums updated by delta accumulate rounding errors, resync() recomputes
+    all of them exactly and the model calls it every resync_every steps.
+    """
+    def __init__(self, model, resync_every: int | None = 100):
+        self.model = model
+        self.resync_every = resync_every
+        self.demand = 0.
+        self.wealth = 0.
+
+    @property
+    def employed_productivity(self) -> float:
+        return self.model.firm.wage_book.total_productivity
+
+    @property
+    def n_unemployed(self) -> int:
+        return self.model.employment.n_unemployed
+
+    def due(self, step: int) -> bool:
+        return bool(self.resync_every) and step % self.resync_every == 0
+
+    def resync(self):
+        """Recompute all totals from the households and the wage book."""
+        model = self.model
+        self.demand = float(model.household_values('demand').sum())
+        self.wealth = float(model.household_values('wealth').sum())
+        wage_book = model.firm.wage_book
+        wage_book.total_productivity = float(wage_book.productivity.sum())
@@ -0,0 +1,231 @@
+"""
+Scaling benchmark of EconomyModel.
+
+For every engine and number of households N the benchmark times model
+construction, step(), the data collector's collect() within the steps
+and get_agent_vars_dataframe(), and reports steps/s, agent-steps/s and
+the peak resident memory. Steps are timed after one untimed warm-up
+step, which also compiles the compiled engine's kernel, for at least
+--steps steps and --min-time seconds, and get_agent_vars_dataframe()
+after --steps steps. Every case runs --repeats times,
+each in a fresh process with a fixed seed, so peak memory belongs to
+that case alone, and the minimum of every metric is reported.
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --baseline baseline.json --threshold 0.25
+
+With --baseline every time and memory metric is compared against the
+stored results, and the benchmark exits with status 1 if any of them is
+more than threshold (relative) worse. Changes below the metric's
+absolute NOISE_FLOOR are ignored.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mesa
+import numpy as np
+import pandas as pd
+
+from kernels import NUMBA_AVAILABLE
+from model import ENGINES, EconomyModel
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# Metrics compared against the baseline, all lower is better
+METRICS = ('construct_s', 'step_s', 'collect_s', 'agent_df_s', 'peak_rss_mb')
+# Absolute changes of the metrics that are never counted as regressions,
+# timer and scheduling noise of the shortest measurements
+NOISE_FLOOR = {'construct_s': 0.05, 'step_s': 0.001, 'collect_s': 0.001,
+               'agent_df_s': 0.02, 'peak_rss_mb': 10}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def run_case(case: tuple[str, int, int, float, int]) -> dict:
+    """Benchmark one engine and size, meant to run in a fresh process.
+    Steps are timed until at least steps steps and min_time seconds, the
+    agent table after the first steps steps.
+    """
+    engine, num_agents, steps, min_time, seed = case
+
+    start = time.perf_counter()
+    model = EconomyModel(N=num_agents, engine=engine, seed=seed)
+    construct = time.perf_counter() - start
+    # untimed, so kernel compilation and first-collect costs stay out of
+    # step_s and collect_s
+    model.step()
+
+    collect = model.datacollector.collect
+    collect_time = 0.
+
+    def timed_collect(model):
+        nonlocal collect_time
+        start = time.perf_counter()
+        collect(model)
+        collect_time += time.perf_counter() - start
+
+    model.datacollector.collect = timed_collect
+    step_time = 0.
+    for _ in range(steps):
+        start = time.perf_counter()
+        model.step()
+        step_time += time.perf_counter() - start
+
+    # after a fixed number of steps, so the table has the same size on
+    # fast and slow machines
+    start = time.perf_counter()
+    model.datacollector.get_agent_vars_dataframe()
+    agent_df = time.perf_counter() - start
+
+    timed_steps = steps
+    while step_time < min_time:
+        start = time.perf_counter()
+        model.step()
+        step_time += time.perf_counter() - start
+        timed_steps += 1
+    step = step_time / timed_steps
+    model.close()
+
+    return {
+        'engine': engine,
+        'N': num_agents,
+        'steps': timed_steps,
+        'construct_s': construct,
+        'step_s': step,
+        'collect_s': collect_time / timed_steps,
+        'agent_df_s': agent_df,
+        'steps_per_s': 1 / step,
+        'agent_steps_per_s': num_agents / step,
+        'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+def best_of(runs: list[dict]) -> dict:
+    """Result of repeated runs of a case, the minimum of every metric,
+    which is the least disturbed by other load on the machine.
+    """
+    result = dict(runs[0], repeats=len(runs))
+    for metric in METRICS:
+        result[metric] = min(run[metric] for run in runs)
+    result['steps_per_s'] = 1 / result['step_s']
+    result['agent_steps_per_s'] = result['N'] / result['step_s']
+    return result
+
+
+def run_benchmark(engines,
+                  sizes,
+                  steps: int,
+                  seed: int = 0,
+                  repeats: int = 3,
+                  min_time: float = 0.5
+                  ) -> list[dict]:
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for engine in engines:
+        for num_agents in sizes:
+            runs = []
+            for _ in range(repeats):
+                # not a Pool, its daemonic workers cannot start shard workers
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    runs.append(pool.submit(
+                        run_case,
+                        (engine, num_agents, steps, min_time, seed)).result())
+            result = best_of(runs)
+            print(f"{engine:>10} N={num_agents:>9,}  "
+                  f"construct {result['construct_s']:8.3f}s  "
+                  f"step {result['step_s']:8.4f}s  "
+                  f"collect {result['collect_s']:8.4f}s  "
+                  f"agent df {result['agent_df_s']:7.3f}s  "
+                  f"{result['steps_per_s']:9.1f} steps/s  "
+                  f"{result['agent_steps_per_s']:12,.0f} agent-steps/s  "
+                  f"peak RSS {result['peak_rss_mb']:8.1f}MB", flush=True)
+            results.append(result)
+    return results
+
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'mesa': mesa.__version__,
+        }
+
+
+def regressions(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    """Metrics of results more than threshold worse than in baseline,
+    and worse by more than their noise floor.
+    """
+    stored = {(r['engine'], r['N']): r for r in baseline['results']}
+    found = []
+    for result in results:
+        reference = stored.get((result['engine'], result['N']))
+        if reference is None:
+            continue
+        for metric in METRICS:
+            if result[metric] - reference[metric] <= NOISE_FLOOR[metric]:
+                continue
+            ratio = result[metric] / reference[metric] if reference[metric] else 1
+            if ratio > 1 + threshold:
+                found.append(f"{result['engine']} N={result['N']:,} {metric}: "
+                             f"{reference[metric]:.4g} -> {result[metric]:.4g} "
+                             f"({ratio - 1:+.0%})")
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    # the compiled engine is only worth timing when Numba compiles it
+    parser.add_argument('--engines', nargs='+', choices=ENGINES,
+                        default=[e for e in ENGINES
+                                 if e != 'compiled' or NUMBA_AVAILABLE])
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--steps', type=int, default=10,
+                        help='minimum number of timed steps')
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='minimum seconds of timed steps')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='runs of every case, the best one counts')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file of a previous --save')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown counted as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.engines, args.sizes, args.steps, args.seed,
+                            repeats=args.repeats, min_time=args.min_time)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'environment': environment(), 'results': results},
+                      f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.threshold)
+        print(f"\ncompared with {args.baseline} "
+              f"({', '.join(f'{k} {v}' for k, v in baseline['environment'].items())})")
+        for regression in found:
+            print('REGRESSION', regression)
+        if found:
+            sys.exit(1)
+        print(f'no regressions above {args.threshold:.0%}')
@@ -0,0 +1,163 @@
+"""
+Checkpoints of the full state of an EconomyModel.
+
+    save_checkpoint(model, 'run.npz')
+    ...
+    model = load_checkpoint('run.npz')
+
+A checkpoint is one compressed .npz file with the household arrays, the
+employment registry, the wage book and the collected history as arrays,
+and the scalar state of the model, central bank, bank and firm, the
+random generator states, the config and the model options as a JSON
+entry. Loading builds a model with the same config and options and
+replaces its state, which is far cheaper than running the steps again,
+and the loaded model continues bit-identically to the saved one.
+
+An attached writer is not part of the checkpoint, attach a new one to
+the loaded model if needed.
+"""
+import dataclasses
+import json
+import os
+
+import numpy as np
+
+from collectors import Retention, _section
+from config import Config
+from model import EconomyModel
+
+CHECKPOINT_VERSION = 1
+
+# Household attributes, arrays of the vectorized engine
+HOUSEHOLD_STATE = ('ptc', 'productivity', 'wealth', 'income',
+                   'desired_cons', 'investment', 'demand')
+# Scalar attributes of the model and of its agents
+MODEL_STATE = ('inf_actual', 'inf_ema', 'inf_expec', 'inf_ema_prev',
+               'unemployment', 'agg_demand')
+CB_STATE = ('rate',)
+BANK_STATE = ('r_loan', 'r_dep')
+FIRM_STATE = ('output', 'price', 'prev_price', 'nu_1', 'base_wage', 'state')
+
+
+def _scalars(obj, names: tuple[str, ...]) -> dict:
+    """JSON-compatible values of attributes, None if not set yet."""
+    values = {}
+    for name in names:
+        value = getattr(obj, name, None)
+        values[name] = value.item() if isinstance(value, np.generic) else value
+    return values
+
+
+def _restore_scalars(obj, values: dict):
+    for name, value in values.items():
+        if value is not None or hasattr(obj, name):
+            setattr(obj, name, value)
+
+
+def save_checkpoint(model: EconomyModel, path: str):
+    """Write the full state of model to path, atomically."""
+    if model.engine == 'sharded':
+        raise ValueError("Models with engine='sharded' cannot be checkpointed, "
+                         "their random streams live in the shard workers")
+    collector = model.datacollector
+    history = collector.agent_history
+    retention = history.records.retention
+    meta = {
+        'version': CHECKPOINT_VERSION,
+        'config': dataclasses.asdict(model.config),
+        'engine': model.engine,
+        'inequality_sample': model.inequality_sample,
+        'agent_every': history.every,
+        'retention': None if retention is None else dataclasses.asdict(retention),
+        'profile': model.profiler is not None,
+        'resync_every': model.aggregates.resync_every,
+        'record_profile': model.record_profile,
+        'steps': model.schedule.steps,
+        'time': model.schedule.time,
+        'model': _scalars(model, MODEL_STATE),
+        'cb': _scalars(model.cb, CB_STATE),
+        'bank': _scalars(model.bank, BANK_STATE),
+        'firm': _scalars(model.firm, FIRM_STATE),
+        'aggregates': {'demand': model.aggregates.demand,
+                       'wealth': model.aggregates.wealth},
+        'n_employed': model.employment.n_employed,
+        'total_productivity': model.firm.wage_book.total_productivity,
+        'wage_book_base_wage': model.firm.wage_book.base_wage,
+        'rng': model.rng.bit_generator.state,
+        'inequality_rng': model._inequality_rng.bit_generator.state,
+        }
+
+    arrays = {'meta': np.array(json.dumps(meta))}
+    for attr in HOUSEHOLD_STATE:
+        arrays['households.' + attr] = model.household_values(attr)
+    arrays['employment.pool'] = model.employment._pool
+    arrays['employment.position'] = model.employment._position
+    arrays['employment.employed'] = model.employment.employed
+    arrays['wage_book.productivity'] = model.firm.wage_book.productivity
+    arrays['wage_book.wages'] = model.firm.wage_book.wages
+    if history.households is not None:
+        arrays['agent_households'] = history.households
+    for key, values in collector.get_state().items():
+        arrays['collector.' + key] = values
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> EconomyModel:
+    """Model in the state saved to path by save_checkpoint."""
+    with np.load(path) as checkpoint:
+        arrays = dict(checkpoint)
+    meta = json.loads(str(arrays['meta']))
+    if meta['version'] != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {meta['version']}")
+
+    retention = meta['retention']
+    model = EconomyModel(
+        engine=meta['engine'],
+        inequality_sample=meta['inequality_sample'],
+        agent_every=meta['agent_every'],
+        agent_households=arrays.get('agent_households'),
+        retention=None if retention is None else Retention(**retention),
+        profile=meta['profile'],
+        record_profile=meta['record_profile'],
+        resync_every=meta['resync_every'],
+        config=Config.from_dict(meta['config']))
+
+    model.schedule.steps = meta['steps']
+    model.schedule.time = meta['time']
+    _restore_scalars(model, meta['model'])
+    _restore_scalars(model.cb, meta['cb'])
+    _restore_scalars(model.bank, meta['bank'])
+    _restore_scalars(model.firm, meta['firm'])
+
+    for attr in HOUSEHOLD_STATE:
+        values = arrays['households.' + attr]
+        if model.vectorized:
+            setattr(model.households, attr, values.copy())
+        else:
+            for household, value in zip(model.households, values.tolist()):
+                setattr(household, attr, value)
+
+    employment = model.employment
+    employment._pool[:] = arrays['employment.pool']
+    employment._position[:] = arrays['employment.position']
+    employment.employed[:] = arrays['employment.employed']
+    employment.n_employed = meta['n_employed']
+
+    wage_book = model.firm.wage_book
+    wage_book.productivity[:] = arrays['wage_book.productivity']
+    wage_book.wages[:] = arrays['wage_book.wages']
+    wage_book.total_productivity = meta['total_productivity']
+    wage_book.base_wage = meta['wage_book_base_wage']
+
+    model.aggregates.demand = meta['aggregates']['demand']
+    model.aggregates.wealth = meta['aggregates']['wealth']
+    model.datacollector.set_state(_section(arrays, 'collector.'))
+    model.rng.bit_generator.state = meta['rng']
+    model._inequality_rng.bit_generator.state = meta['inequality_rng']
+    return model
@@ -0,0 +1,412 @@
+from dataclasses import dataclass
+
+import mesa
+import numpy as np
+import pandas as pd
+
+# Cross-sectional statistics recorded by summary retention
+SUMMARY_STATISTICS = ('mean', 'std', 'min', 'p10', 'median', 'p90', 'max')
+
+
+@dataclass(frozen=True)
+class Retention:
+    """Bounded history of a HouseholdDataCollector.
+
+    The last window records are kept at full resolution. Records leaving
+    the window are thinned to every keep_every-th one and kept in an
+    archive of at most archive records. When the archive is full every
+    other archived record is dropped and keep_every doubles, so the
+    archive always spans the whole run at a coarser resolution.
+
+    With summaries=True household reporters are recorded as the
+    SUMMARY_STATISTICS over households instead of one value per
+    household.
+    """
+    window: int = 1000
+    keep_every: int = 10
+    archive: int = 1000
+    summaries: bool = False
+
+    @property
+    def records(self) -> int:
+        """Maximum number of records kept."""
+        return self.window + self.archive
+
+
+def summarize(values: np.ndarray) -> np.ndarray:
+    """SUMMARY_STATISTICS of values."""
+    p10, median, p90 = np.quantile(values, [0.1, 0.5, 0.9])
+    return np.array([values.mean(), values.std(), values.min(),
+                     p10, median, p90, values.max()])
+
+
+def _section(state: dict, prefix: str) -> dict:
+    """Entries of state whose keys start with prefix, without it."""
+    return {key[len(prefix):]: value for key, value in state.items()
+            if key.startswith(prefix)}
+
+
+class _Rows:
+    """Preallocated rows of named arrays, used as a ring buffer."""
+    def __init__(self, widths: dict[str, int], capacity: int):
+        self.steps = np.zeros(capacity, dtype=np.int64)
+        self.seqs = np.zeros(capacity, dtype=np.int64)
+        self.data = {name: np.zeros((capacity, width))
+                     for name, width in widths.items()}
+        self.start = 0
+        self.n = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.steps)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.steps.nbytes + self.seqs.nbytes
+                + sum(values.nbytes for values in self.data.values()))
+
+    def _order(self) -> np.ndarray:
+        return (self.start + np.arange(self.n)) % max(self.capacity, 1)
+
+    def grow(self):
+        order = self._order()
+        capacity = 2 * max(self.capacity, 1)
+        for name in ('steps', 'seqs'):
+            grown = np.zeros(capacity, dtype=np.int64)
+            grown[:self.n] = getattr(self, name)[order]
+            setattr(self, name, grown)
+        for name, values in self.data.items():
+            grown = np.zeros((capacity, values.shape[1]))
+            grown[:self.n] = values[order]
+            self.data[name] = grown
+        self.start = 0
+
+    def push(self, step: int, seq: int, values: dict):
+        row = (self.start + self.n) % self.capacity
+        self.steps[row] = step
+        self.seqs[row] = seq
+        for name, value in values.items():
+            self.data[name][row] = value
+        self.n += 1
+
+    def pop(self) -> tuple[int, int, dict]:
+        """Remove the oldest row, its values are views that stay valid
+        until the next push.
+        """
+        row = self.start
+        self.start = (self.start + 1) % self.capacity
+        self.n -= 1
+        return (self.steps[row], self.seqs[row],
+                {name: values[row] for name, values in self.data.items()})
+
+    def keep(self, mask: np.ndarray):
+        """Keep only the rows where mask is true, in order."""
+        order = self._order()[mask]
+        n = len(order)
+        self.steps[:n] = self.steps[order]
+        self.seqs[:n] = self.seqs[order]
+        for values in self.data.values():
+            values[:n] = values[order]
+        self.start, self.n = 0, n
+
+    def load(self, steps: np.ndarray, seqs: np.ndarray, data: dict):
+        """Replace all rows, growing only if the rows do not fit."""
+        n = len(steps)
+        self.start = self.n = 0
+        while self.capacity < n:
+            self.grow()
+        self.steps[:n] = steps
+        self.seqs[:n] = seqs
+        for name, values in data.items():
+            self.data[name][:n] = values
+        self.n = n
+
+    def ordered(self) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+        order = self._order()
+        return (self.steps[order], self.seqs[order],
+                {name: values[order] for name, values in self.data.items()})
+
+
+class RecordStore:
+    """Rows of named float arrays, one row per recorded step.
+
+    Without retention all rows are kept in arrays that double when full.
+    With a Retention the arrays for window and archive are allocated at
+    construction and never grow, so nbytes is fixed from the start.
+    """
+    def __init__(self,
+                 widths: dict[str, int],
+                 retention: Retention | None = None,
+                 capacity: int = 64
+                 ):
+        self.retention = retention
+        self.n_appended = 0
+        if retention is None:
+            self._recent = _Rows(widths, capacity)
+            self._archive = _Rows(widths, 0)
+        else:
+            self._recent = _Rows(widths, retention.window)
+            self._archive = _Rows(widths, retention.archive)
+            self.keep_every = retention.keep_every
+
+    @property
+    def nbytes(self) -> int:
+        return self._recent.nbytes + self._archive.nbytes
+
+    def __len__(self):
+        return self._archive.n + self._recent.n
+
+    def append(self, step: int, values: dict):
+        seq = self.n_appended
+        self.n_appended += 1
+        recent = self._recent
+        if recent.n == recent.capacity:
+            if self.retention is None:
+                recent.grow()
+            elif recent.capacity:
+                self._retire(*recent.pop())
+            else:
+                self._retire(step, seq, values)
+                return
+        recent.push(step, seq, values)
+
+    def _retire(self, step: int, seq: int, values: dict):
+        """Move a record leaving the window to the thinned archive."""
+        archive = self._archive
+        if not archive.capacity or seq % self.keep_every:
+            return
+        if archive.n == archive.capacity:
+            _, seqs, _ = archive.ordered()
+            archive.keep(seqs % (2 * self.keep_every) == 0)
+            self.keep_every *= 2
+            if seq % self.keep_every:
+                return
+        archive.push(step, seq, values)
+
+    def arrays(self) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """Steps and values of all kept rows, oldest first."""
+        archive_steps, _, archive_data = self._archive.ordered()
+        recent_steps, _, recent_data = self._recent.ordered()
+        return (np.concatenate([archive_steps, recent_steps]),
+                {name: np.concatenate([archive_data[name], recent_data[name]])
+                 for name in recent_data})
+
+    def clear(self):
+        """Remove all rows, keeping the allocated arrays."""
+        for rows in (self._recent, self._archive):
+            rows.start = rows.n = 0
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Kept rows and counters as arrays, for checkpoints."""
+        state = {'n_appended': np.int64(self.n_appended),
+                 'keep_every': np.int64(getattr(self, 'keep_every', 1))}
+        for part, rows in (('archive', self._archive), ('recent', self._recent)):
+            steps, seqs, data = rows.ordered()
+            state[part + '.steps'] = steps
+            state[part + '.seqs'] = seqs
+            for name, values in data.items():
+                state[part + '.' + name] = values
+        return state
+
+    def set_state(self, state: dict[str, np.ndarray]):
+        """Restore get_state() of a store with the same widths and retention."""
+        self.n_appended = int(state['n_appended'])
+        if self.retention is not None:
+            self.keep_every = int(state['keep_every'])
+        for part, rows in (('archive', self._archive), ('recent', self._recent)):
+            rows.load(state[part + '.steps'], state[part + '.seqs'],
+                      {name: state[part + '.' + name] for name in rows.data})
+
+
+class AgentHistory:
+    """Household attributes recorded into (steps x households) arrays.
+
+    Values are written column-wise from the model's household arrays
+    every ``every`` steps, for all households or only for the household
+    indices in ``households``. Without retention arrays are preallocated
+    for ``capacity`` recordings and doubled when full, with a Retention
+    the history is bounded, see Retention.
+    """
+    def __init__(self,
+                 attributes: dict[str, str],
+                 unique_ids: np.ndarray,
+                 households: np.ndarray | None = None,
+                 every: int = 1,
+                 retention: Retention | None = None,
+                 capacity: int = 64
+                 ):
+        self.attributes = attributes
+        self.households = households
+        self.unique_ids = unique_ids
+        if households is not None:
+            self.households = np.asarray(households, dtype=np.int64)
+            self.unique_ids = unique_ids[self.households]
+        self.every = every
+        self.summaries = retention is not None and retention.summaries
+        width = len(SUMMARY_STATISTICS) if self.summaries else len(self.unique_ids)
+        self.records = RecordStore({name: width for name in attributes},
+                                   retention, capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return self.records.nbytes
+
+    def record(self, model):
+        step = model.schedule.steps
+        if step % self.every:
+            return
+
+        values = {}
+        for name, attr in self.attributes.items():
+            values[name] = model.household_values(attr, self.households)
+            if self.summaries:
+                values[name] = summarize(values[name])
+        self.records.append(step, values)
+
+    def drain(self) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """Steps and (steps x households) values recorded so far, which
+        are then removed, keeping the allocated arrays for reuse.
+        """
+        steps, data = self.records.arrays()
+        self.records.clear()
+        return steps, data
+
+    def to_dataframe(self) -> pd.DataFrame:
+        steps, data = self.records.arrays()
+        if self.summaries:
+            columns = pd.MultiIndex.from_product(
+                [list(data), SUMMARY_STATISTICS], names=[None, 'Statistic'])
+            return pd.DataFrame(np.hstack(list(data.values())),
+                                index=pd.Index(steps, name='Step'),
+                                columns=columns)
+
+        n, k = len(steps), len(self.unique_ids)
+        index = pd.MultiIndex.from_arrays(
+            [np.repeat(steps, k), np.tile(self.unique_ids, n)],
+            names=["Step", "AgentID"])
+        return pd.DataFrame(
+            {name: values.ravel() for name, values in data.items()},
+            index=index)
+
+
+class HouseholdDataCollector(mesa.DataCollector):
+    """DataCollector whose agent reporters are household attributes.
+
+    Model reporters are collected as usual, agent reporters map column
+    names to household attribute names and go to an AgentHistory, so
+    there are no per-agent reporter calls and no rows for the central
+    bank, bank and firm.
+
+    With a Retention both model and household reporters are kept in
+    bounded RecordStores instead of model_vars lists, and memory use is
+    fixed when the collector is created.
+
+    drain() hands everything collected so far to a writer and frees it,
+    the dataframes then only contain the steps collected since.
+    """
+    def __init__(self,
+                 model,
+                 model_reporters: dict,
+                 agent_reporters: dict[str, str],
+                 agent_every: int = 1,
+                 agent_households=None,
+                 retention: Retention | None = None
+                 ):
+        super().__init__(model_reporters=model_reporters)
+        self.agent_history = AgentHistory(agent_reporters,
+                                          model.household_ids,
+                                          households=agent_households,
+                                          every=agent_every,
+                                          retention=retention)
+        self.model_history = None
+        if retention is not None:
+            self.model_history = RecordStore(
+                {name: 1 for name in model_reporters}, retention)
+        self.n_drained = 0  # model reporter steps removed by drain()
+
+    def collect(self, model):
+        super().collect(model)
+        if self.model_history is not None:
+            values = {}
+            for name, collected in self.model_vars.items():
+                value = collected.pop()
+                values[name] = np.nan if value is None else value
+            self.model_history.append(model.schedule.steps, values)
+        self.agent_history.record(model)
+
+    def drain(self) -> dict[str, np.ndarray]:
+        """Model and household reporter values collected since the last
+        drain, keyed as in output.ChunkedWriter chunks, removed from
+        memory.
+        """
+        if self.model_history is not None:
+            steps, model_data = self.model_history.arrays()
+            self.model_history.clear()
+            data = {'model.Step': steps}
+            for name, values in model_data.items():
+                data['model.' + name] = values[:, 0]
+        else:
+            n = len(next(iter(self.model_vars.values()), []))
+            data = {'model.Step': np.arange(self.n_drained, self.n_drained + n)}
+            for name, values in self.model_vars.items():
+                data['model.' + name] = np.array(values, dtype=float)
+                values.clear()
+            self.n_drained += n
+
+        steps, agent_data = self.agent_history.drain()
+        data['agent.Step'] = steps
+        if self.agent_history.summaries:
+            data['agent.Statistic'] = np.array(SUMMARY_STATISTICS)
+        else:
+            data['agent.AgentID'] = self.agent_history.unique_ids
+        for name, values in agent_data.items():
+            data['agent.' + name] = values
+        return data
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Everything collected so far as arrays, for checkpoints. Missing
+        model reporter values (None) are stored as the positions in
+        model_vars.none.<reporter>.
+        """
+        state = {'n_drained': np.int64(self.n_drained)}
+        if self.model_history is not None:
+            for key, values in self.model_history.get_state().items():
+                state['model_history.' + key] = values
+        else:
+            for name, values in self.model_vars.items():
+                state['model_vars.' + name] = np.array(
+                    [np.nan if v is None else v for v in values], dtype=float)
+                state['model_vars.none.' + name] = np.array(
+                    [i for i, v in enumerate(values) if v is None],
+                    dtype=np.int64)
+        for key, values in self.agent_history.records.get_state().items():
+            state['agent_history.' + key] = values
+        return state
+
+    def set_state(self, state: dict[str, np.ndarray]):
+        """Restore get_state() of a collector with the same reporters and
+        retention.
+        """
+        self.n_drained = int(state['n_drained'])
+        if self.model_history is not None:
+            self.model_history.set_state(_section(state, 'model_history.'))
+        else:
+            for name in self.model_vars:
+                values = state['model_vars.' + name].tolist()
+                for i in state['model_vars.none.' + name]:
+                    values[i] = None
+                self.model_vars[name] = values
+        self.agent_history.records.set_state(_section(state, 'agent_history.'))
+
+    def get_model_vars_dataframe(self):
+        if self.model_history is not None:
+            steps, data = self.model_history.arrays()
+            return pd.DataFrame({name: values[:, 0]
+                                 for name, values in data.items()},
+                                index=steps)
+        df = super().get_model_vars_dataframe()
+        df.index += self.n_drained
+        return df
+
+    def get_agent_vars_dataframe(self):
+        return self.agent_history.to_dataframe()
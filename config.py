@@ -0,0 +1,87 @@
+import dataclasses
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
+
+PARAMS_PATH = Path(__file__).resolve().parent / 'params.yaml'
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    num_agents: int
+    ema_param: float  # exponential moving average parameter
+    r_base: float  # baseline interest
+    intensity: float  # intensity of policy
+    inf_target: float  # target inflation set by CB
+    trust: float
+
+
+@dataclass(frozen=True)
+class BankConfig:
+    mu_loan: float
+    mu_dep: float
+    ltv: float
+
+
+@dataclass(frozen=True)
+class FirmConfig:
+    adj_w: float
+    adj_p: float
+    nu_2: float
+    sens: float
+
+
+@dataclass(frozen=True)
+class HouseholdConfig:
+    ptc: float
+    sens: float
+    mu_k: float
+    sigma_k: float
+    mu_1: float
+    mu_2: float
+    sigma: float
+    inv_cost: float
+    mean_w: float
+    sigma_w: float
+
+
+@dataclass(frozen=True)
+class Config:
+    """Immutable parameters of all sections of params.yaml."""
+    model: ModelConfig
+    bank: BankConfig
+    firm: FirmConfig
+    household: HouseholdConfig
+
+    @classmethod
+    def from_dict(cls, params: dict) -> 'Config':
+        return cls(**{
+            field.name: field.type(**params[field.name])
+            for field in dataclasses.fields(cls)
+            })
+
+    def override(self, **sections: dict) -> 'Config':
+        """Copy of the config with some parameters replaced, e.g.
+        config.override(bank={'ltv': 0.6}, model={'trust': 0.5}).
+        """
+        return dataclasses.replace(self, **{
+            name: dataclasses.replace(getattr(self, name), **params)
+            for name, params in sections.items()
+            })
+
+    def override_model(self, **params) -> 'Config':
+        """Copy of the config with the model parameters that are not None
+        replaced, for model arguments that default to params.yaml.
+        """
+        return self.override(model={
+            name: value for name, value in params.items() if value is not None
+            })
+
+
+@lru_cache(maxsize=None)
+def load_config(path=PARAMS_PATH) -> Config:
+    """Read a params file once, later calls return the cached Config."""
+    with open(path, 'r') as stream:
+        return Config.from_dict(yaml.safe_load(stream))
@@ -0,0 +1,138 @@
+"""
+Early termination of EconomyModel runs.
+
+A RunController steps a model until one of its stopping criteria fires
+or the step budget is spent, and records why and at which step the run
+stopped:
+
+    controller = RunController(model, [Converged(), Diverged(), WallClock(600)])
+    controller.run(2000)
+    controller.stop_reason, controller.stop_step
+
+Criteria are checked after every step, or every check_every steps. A
+criterion is any object with a check(model) method returning the reason
+to stop, or None to go on. Criteria read the model through reporter
+functions, so Gini is computed from the same cached inequality summary
+the next collect uses.
+"""
+import itertools
+import math
+import time
+from collections import deque
+
+from reporters import (
+    compute_gini,
+    show_inf_ema,
+    show_output,
+    show_price,
+    show_unemployment
+)
+
+# Reporters that settle once a run reaches its steady state and the
+# change of their window mean still counted as settled
+CONVERGENCE_REPORTERS = {'Gini': (compute_gini, 0.005),
+                         'Inflation EMA': (show_inf_ema, 0.02),
+                         'Unemployment': (show_unemployment, 0.01)}
+# Reporters guarded against divergence and their (lower, upper) bounds,
+# None for no bound
+DIVERGENCE_REPORTERS = {'Price': (show_price, (0., 1e100)),
+                        'Output': (show_output, (0., None))}
+
+# stop_reason of runs that used their whole step budget
+MAX_STEPS = 'max steps'
+
+
+class Converged:
+    """Stop when the mean of every reporter over the last window checks
+    differs from its mean over the window before by at most its
+    tolerance. Noisy reporters such as the inflation EMA never stop
+    fluctuating, their rolling mean settles.
+    """
+    def __init__(self, reporters: dict | None = None, window: int = 100):
+        self.reporters = CONVERGENCE_REPORTERS if reporters is None else reporters
+        self.window = window
+        self.history = {name: deque(maxlen=2 * window) for name in self.reporters}
+
+    def check(self, model) -> str | None:
+        for name, (reporter, _) in self.reporters.items():
+            self.history[name].append(reporter(model))
+        for name, (_, tol) in self.reporters.items():
+            values = self.history[name]
+            if len(values) < 2 * self.window:
+                return None
+            previous = sum(itertools.islice(values, self.window))
+            if abs(sum(values) - 2 * previous) / self.window > tol:
+                return None
+        return f'converged over {self.window} checks'
+
+
+class Diverged:
+    """Stop when a reporter is NaN or infinite or leaves its bounds, e.g.
+    when the price explodes or output collapses.
+    """
+    def __init__(self, reporters: dict | None = None):
+        self.reporters = DIVERGENCE_REPORTERS if reporters is None else reporters
+
+    def check(self, model) -> str | None:
+        for name, (reporter, (lower, upper)) in self.reporters.items():
+            value = reporter(model)
+            if not math.isfinite(value):
+                return f'diverged: {name} is {value}'
+            if lower is not None and value <= lower:
+                return f'diverged: {name} {value:.4g} <= {lower:g}'
+            if upper is not None and value >= upper:
+                return f'diverged: {name} {value:.4g} >= {upper:g}'
+        return None
+
+
+class WallClock:
+    """Stop when more than seconds of wall time passed since the
+    criterion was created.
+    """
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.start = time.perf_counter()
+
+    def check(self, model) -> str | None:
+        if time.perf_counter() - self.start > self.seconds:
+            return f'wall clock budget of {self.seconds:g}s spent'
+        return None
+
+
+class RunController:
+    """Step a model until a stopping criterion fires.
+
+    After run(), stop_reason holds the reason of the first criterion
+    that fired, or MAX_STEPS, and stop_step the model's step count at
+    that point.
+    """
+    def __init__(self, model, criteria, check_every: int = 1):
+        self.model = model
+        self.criteria = list(criteria)
+        self.check_every = check_every
+        self.stop_reason = None
+        self.stop_step = None
+
+    def check(self) -> str | None:
+        for criterion in self.criteria:
+            reason = criterion.check(self.model)
+            if reason is not None:
+                return reason
+        return None
+
+    def run(self, max_steps: int) -> str:
+        """Step the model at most max_steps times and return the reason
+        it stopped.
+        """
+        model = self.model
+        self.stop_reason = None
+        for i in range(1, max_steps + 1):
+            model.step()
+            if i % self.check_every == 0:
+                self.stop_reason = self.check()
+                if self.stop_reason is not None:
+                    break
+        else:
+            self.stop_reason = MAX_STEPS
+        self.stop_step = model.schedule.steps
+        return self.stop_reason
@@ -1,8 +1,13 @@
+import math
+import uuid
+
+from downsample import MinMaxDownsampler
 from model import EconomyModel
-import numpy as np
+from sessions import SessionPool
 
 import dash
 from dash import dcc, html
+import plotly
 import plotly.graph_objects as go
 from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
@@ -14,12 +19,147 @@ bg_color = 'rgb(252, 248, 227)'
 suppress_callback_exceptions = True
 
 
-def blank_fig(**update_layput_params):
-    fig = go.Figure(go.Scatter(x=[0], y=[0]))
-    fig.update_layout(**update_layput_params)
+# Live charts: graph id -> (title, model reporters plotted as traces)
+CHARTS = {
+    'gini-graph': ('Gini', ['Gini']),
+    'cb-rate-graph': ('CB Rate', ['CB Rate']),
+    'output-demand-graph': ('Output and demand', ['Output', 'Demand']),
+    'inf-graph': ('Inflation', ['Actual Inflation',
+                                'Inflation EMA',
+                                'Inflation Expectations']),
+    # 'price-graph': ('Price', ['Price']),
+    'u-graph': ('Unemployment', ['Unemployment']),
+}
+
+# Points per trace: long series are downsampled to this budget, and the
+# full resolution is sent when zooming in on at most this many steps
+POINT_BUDGET = 1000
+
+
+def series_fig(graph_id, traces=None, tails=None):
+    """WebGL line chart with one trace per reporter of the graph, either
+    empty or drawn from a list of (x, y) per trace. tails are the (x, y)
+    of the incomplete bucket of every reporter, drawn as a second trace
+    in the same color after all reporter traces.
+    """
+    title, columns = CHARTS[graph_id]
+    traces = traces or [([], [])] * len(columns)
+    tails = tails or [([], [])] * len(columns)
+    colors = plotly.colors.DEFAULT_PLOTLY_COLORS
+    fig = go.Figure(
+        [go.Scattergl(x=x, y=y, mode='lines', name=column,
+                      legendgroup=column, line_color=colors[i % len(colors)])
+         for i, (column, (x, y)) in enumerate(zip(columns, traces))]
+        + [go.Scattergl(x=x, y=y, mode='lines', name=column,
+                        legendgroup=column, showlegend=False,
+                        line_color=colors[i % len(colors)])
+           for i, (column, (x, y)) in enumerate(zip(columns, tails))])
+    fig.update_layout(title=title, xaxis_title='Step',
+                      showlegend=len(columns) > 1,
+                      uirevision=graph_id)  # keep the zoom on redraws
     return fig
 
 
+def downsamplers(session):
+    """Min/max downsamplers of all plotted reporters of a session, caught
+    up with the steps its worker has published since the last call.
+    """
+    view = session.view
+    if 'downsamplers' not in view:
+        view['downsamplers'] = {
+            column: MinMaxDownsampler(POINT_BUDGET)
+            for _, columns in CHARTS.values() for column in columns
+            }
+        view['consumed'] = 0
+
+    model_vars = session.worker.model.datacollector.model_vars
+    published = session.worker.published_steps
+    for column, sampler in view['downsamplers'].items():
+        sampler.extend(model_vars[column][view['consumed']:published])
+    view['consumed'] = published
+    return view['downsamplers']
+
+
+def sampler_state(samplers):
+    """Generation and number of complete buckets of the samplers, which
+    describe the downsampled points a chart drawn from them has.
+    """
+    sampler = next(iter(samplers.values()))  # all advance in lockstep
+    return {'generation': sampler.generation, 'buckets': len(sampler.buckets)}
+
+
+def chart_updates(session, sent):
+    """New figure or extendData payload for every chart.
+
+    sent maps every chart to the downsampled points the browser already
+    has. Usually only newly completed buckets are appended, and the tail
+    traces are replaced by the incomplete bucket, so an update costs the
+    same however long the model has been running and charts move on every
+    step even when buckets span many steps. After buckets were merged, or
+    for a chart that has nothing yet, the whole chart is sent within the
+    point budget. Zoomed in charts show full resolution
+    data of their range and are left alone until zoomed out.
+    """
+    samplers = downsamplers(session)
+    state = sampler_state(samplers)
+    zoomed = session.view.setdefault('zoomed', set())
+    sent = dict(sent or {})
+
+    figures, extensions = [], []
+    for graph_id, (title, columns) in CHARTS.items():
+        if graph_id in zoomed:
+            figures.append(dash.no_update)
+            extensions.append(dash.no_update)
+            continue
+        previous = sent.get(graph_id)
+        redraw = (previous is None
+                  or previous['generation'] != state['generation']
+                  or previous['buckets'] > state['buckets'])
+        start = 0 if redraw else previous['buckets']
+        traces = [samplers[column].points(start) for column in columns]
+        tails = [samplers[column].tail() for column in columns]
+        if redraw:
+            figures.append(series_fig(graph_id, traces, tails))
+            extensions.append(dash.no_update)
+        else:
+            # keeping only as many tail points as are sent replaces them
+            tail_ids = [i for i, (x, _) in enumerate(tails) if x]
+            updates = traces + [tails[i] for i in tail_ids]
+            max_points = ([POINT_BUDGET] * len(columns)
+                          + [len(tails[i][0]) for i in tail_ids])
+            figures.append(dash.no_update)
+            extensions.append((
+                {'x': [x for x, _ in updates], 'y': [y for _, y in updates]},
+                list(range(len(columns)))
+                + [len(columns) + i for i in tail_ids],
+                {'x': max_points, 'y': max_points}
+                ))
+        sent[graph_id] = state
+    return figures, extensions, sent
+
+
+def zoomed_fig(session, graph_id, first, last):
+    """Chart of steps first to last, at full resolution if they fit into
+    the point budget and downsampled otherwise.
+    """
+    title, columns = CHARTS[graph_id]
+    model_vars = session.worker.model.datacollector.model_vars
+    first = max(first, 0)
+    last = min(last, session.worker.published_steps)
+
+    traces = []
+    for column in columns:
+        values = model_vars[column][first:last]
+        if len(values) <= POINT_BUDGET:
+            traces.append((list(range(first, first + len(values))), values))
+        else:
+            sampler = MinMaxDownsampler(POINT_BUDGET)
+            sampler.extend(values)
+            x, y = sampler.points()
+            traces.append(([first + i for i in x], y))
+    return series_fig(graph_id, traces)
+
+
 table_header = [
     html.Thead(html.Tr([html.Th("Description"), html.Th("Symbol"), html.Th("Value")]))
 ]
@@ -45,10 +185,26 @@ table_body = [html.Tbody([row1, row2, row3, row4, row5, row6, row7,
 
 app = dash.Dash(external_stylesheets=[dbc.themes.MINTY])
 
-model = EconomyModel()
 
 
-app.layout = html.Div([
+def new_model(*args, seed=0):
+    """Model for the dashboard, which only plots model reporters. Seeded,
+    so every session starts from the same reproducible run.
+    """
+    return EconomyModel(*args, agent_households=[], seed=seed)
+
+
+# Every browser session gets its own model, stepped by a background worker;
+# callbacks only render it
+pool = SessionPool(make_model=new_model,
+                   memory_budget=4 * 2**30,  # bytes
+                   idle_timeout=15 * 60)  # seconds
+
+
+def serve_layout():
+    """Layout served on every page load, with a new session id."""
+    return html.Div([
+        dcc.Store(id='session-id', data=str(uuid.uuid4())),
         html.Div([
                 html.Div([
                     html.H1(['An Agent-Based Model of Household Inequality'],
@@ -93,6 +249,9 @@ app.layout = html.Div([
         ])
 
 
+app.layout = serve_layout
+
+
 @app.callback(Output("content", "children"), [Input("tabs", "active_tab")])
 def switch_tab(at):
     if at == "Simulation":
@@ -188,12 +347,18 @@ def switch_tab(at):
                         'marginBottom': '40px',
                         }
             ),
+            html.Div(id='session-message',
+                     className='text-danger text-center'),
 
             html.Div([
                     html.Label("Step per second", className='text-dark'),
                     dcc.Slider(1, 10, 1,
                             value=1,
                             id='sps-slider'),
+                    dbc.Switch(id='fast-forward',
+                               label='Fast-forward (as many steps as possible)',
+                               value=False,
+                               className='text-dark'),
                 ],
                     className="d-grid gap-2 col-9 mx-auto",),
 
@@ -201,19 +366,14 @@ def switch_tab(at):
                 html.Div(
                     dcc.Graph(
                         id='gini-graph',
-                        figure=blank_fig(
-                            title='Gini',
-                            xaxis_title='Step'
-                            )
+                        figure=series_fig('gini-graph')
                         ),
                     style={'width': '48%', 'flex': '1'}
                 ),
 
                 html.Div(
                     dcc.Graph(id='cb-rate-graph',
-                            figure=blank_fig(
-                                title='CB Rate',
-                                xaxis_title='Step')
+                            figure=series_fig('cb-rate-graph')
                             ),
                     style={'width': '48%', 'flex': '1'}
                 ),
@@ -226,19 +386,14 @@ def switch_tab(at):
                 html.Div(
                     dcc.Graph(
                         id='output-demand-graph',
-                        figure=blank_fig(
-                            title='Output and demand',
-                            xaxis_title='Step'
-                            )
+                        figure=series_fig('output-demand-graph')
                         ),
                     style={'width': '48%', 'flex': '1'}
                 ),
 
                 html.Div(
                     dcc.Graph(id='inf-graph',
-                            figure=blank_fig(
-                                title='Inflation',
-                                xaxis_title='Step')
+                            figure=series_fig('inf-graph')
                             ),
                     style={'width': '48%', 'flex': '1'}
                 ),
@@ -249,17 +404,13 @@ def switch_tab(at):
             html.Div([
                 html.Div(
                     dcc.Graph(id='u-graph',
-                            figure=blank_fig(
-                                title='Unemployment',
-                                xaxis_title='Step')
+                            figure=series_fig('u-graph')
                             ),
                     style={'width': '48%', 'flex': '1'}
                 ),
                 html.Div(
                 #     dcc.Graph(id='price-graph',
-                #             figure=blank_fig(
-                #                 title='Price',
-                #                 xaxis_title='Step')
+                #             figure=series_fig('price-graph')
                 #             ),
                     style={'width': '48%', 'flex': '1'}
                 ),
@@ -267,6 +418,7 @@ def switch_tab(at):
                 style={
                     'display': 'flex'
                     }),
+            dcc.Store(id='sent-steps', data=None),
             dcc.Interval(
                     id='interval-component',
                     interval=1000,  # in milliseconds
@@ -542,76 +694,59 @@ def switch_tab(at):
 
 
 @app.callback(
-    [Output('gini-graph', 'figure', allow_duplicate=True),
-     Output('cb-rate-graph', 'figure', allow_duplicate=True),
-     Output('output-demand-graph', 'figure', allow_duplicate=True),
-     Output('inf-graph', 'figure', allow_duplicate=True),
-    #  Output('price-graph', 'figure', allow_duplicate=True),
-     Output('u-graph', 'figure', allow_duplicate=True)],
+    [*(Output(graph_id, 'figure', allow_duplicate=True) for graph_id in CHARTS),
+     *(Output(graph_id, 'extendData') for graph_id in CHARTS),
+     Output('sent-steps', 'data', allow_duplicate=True)],
     [Input('interval-component', 'n_intervals')],
+    [State('sent-steps', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=True,
 )
-def update_graphs_live(n_intervals):
-    model.step()
-
-    gini_fig = go.Figure()
-    gini_fig.add_trace(go.Line(y=model.datacollector.model_vars['Gini']))
-    gini_fig.update_layout(
-        title='Gini',
-        xaxis_title='Step'
-        )
-
-    cb_rate_fig = go.Figure()
-    cb_rate_fig.add_trace(go.Line(y=model.datacollector.model_vars['CB Rate']))
-    cb_rate_fig.update_layout(
-        title='CB Rate',
-        xaxis_title='Step'
-        )
-
-    output_demand_fig = go.Figure()
-    output_demand_fig.add_trace(
-        go.Line(y=model.datacollector.model_vars['Output'],
-                name='Output')
-        )
-    output_demand_fig.add_trace(
-        go.Line(y=model.datacollector.model_vars['Demand'],
-                name='Demand')
-        )
-    output_demand_fig.update_layout(
-        title='Output and demand',
-        xaxis_title='Step'
-        )
-
-    inf_fig = go.Figure()
-    inf_fig.add_trace(go.Line(y=model.datacollector.model_vars['Actual Inflation'],
-                              name='Actual Inflation')
-                      )
-    inf_fig.add_trace(go.Line(y=model.datacollector.model_vars['Inflation EMA'],
-                              name='Inflation EMA')
-                      )
-    inf_fig.add_trace(go.Line(y=model.datacollector.model_vars['Inflation Expectations'],
-                              name='Inflation Expectations')
-                      )
-    inf_fig.update_layout(
-        title='Inflation',
-        xaxis_title='Step'
-        )
-
-    # price_fig = go.Figure()
-    # price_fig.add_trace(go.Line(y=model.datacollector.model_vars['Price']))
-    # price_fig.update_layout(
-    #     title='Price',
-    #     xaxis_title='Step'
-    #     )
-
-    u_fig = go.Figure()
-    u_fig.add_trace(go.Line(y=model.datacollector.model_vars['Unemployment']))
-    u_fig.update_layout(
-        title='Unemployment',
-        xaxis_title='Step'
-        )
-
-    return gini_fig, cb_rate_fig, output_demand_fig, inf_fig, u_fig
+def update_graphs_live(n_intervals, sent, session_id):
+    with pool.session(session_id) as session:
+        figures, extensions, sent = chart_updates(session, sent)
+    return (*figures, *extensions, sent)
+
+
+def zoom_callback(graph_id):
+    """Callback loading full resolution data into a chart when the user
+    zooms in, and the downsampled series again when zooming out. While a
+    chart is zoomed in the live updates skip it.
+    """
+    @app.callback(
+        [Output(graph_id, 'figure', allow_duplicate=True),
+         Output('sent-steps', 'data', allow_duplicate=True)],
+        [Input(graph_id, 'relayoutData')],
+        [State('sent-steps', 'data'),
+         State('session-id', 'data')],
+        prevent_initial_call=True,
+    )
+    def zoom(relayout, sent, session_id):
+        relayout = relayout or {}
+        if 'xaxis.range[0]' in relayout:
+            first = int(relayout['xaxis.range[0]'])
+            last = int(math.ceil(relayout['xaxis.range[1]'])) + 1
+            with pool.session(session_id) as session:
+                session.view.setdefault('zoomed', set()).add(graph_id)
+                figure = zoomed_fig(session, graph_id, first, last)
+            # the chart is redrawn in full when zooming out
+            return figure, {**(sent or {}), graph_id: None}
+        if relayout.get('xaxis.autorange'):
+            with pool.session(session_id) as session:
+                session.view.setdefault('zoomed', set()).discard(graph_id)
+                samplers = downsamplers(session)
+                columns = CHARTS[graph_id][1]
+                figure = series_fig(graph_id,
+                                    [samplers[column].points() for column in columns],
+                                    [samplers[column].tail() for column in columns])
+                state = sampler_state(samplers)
+            return figure, {**(sent or {}), graph_id: state}
+        return dash.no_update, dash.no_update
+    return zoom
+
+
+for graph_id in CHARTS:
+    zoom_callback(graph_id)
 
 
 @app.callback(
@@ -621,25 +756,29 @@ def update_graphs_live(n_intervals):
      Output('inf-graph', 'figure'),
     #  Output('price-graph', 'figure'),
      Output('u-graph', 'figure'),
+     Output('sent-steps', 'data'),
+     Output('session-message', 'children'),
      ],
     [Input('reset-button', 'n_clicks')],
     [State('number_of_agents', 'value'),
      State('baseline_interest_rate', 'value'),
      State('intensity_of_central_bank_policy', 'value'),
      State('central_bank_target_rate', 'value'),
-     State('trust_of_agents_to_central_bank', 'value')
+     State('trust_of_agents_to_central_bank', 'value'),
+     State('interval-component', 'disabled'),
+     State('session-id', 'data')
      ]
 )
 def callback_func_reset_interval(button_clicks, *args):
-    global model
-    model = EconomyModel(*args)
-    return (blank_fig(title='Gini', xaxis_title='Step'),
-            blank_fig(title='CB Rate', xaxis_title='Step'),
-            blank_fig(title='Output and demand', xaxis_title='Step'),
-            blank_fig(title='Inflation', xaxis_title='Step'),
-            # blank_fig(title='Price', xaxis_title='Step'),
-            blank_fig(title='Unemployment', xaxis_title='Step')
-            )
+    *params, paused, session_id = args
+    num_agents = params[0]
+    if num_agents and not pool.fits(num_agents):
+        return (*(dash.no_update for _ in CHARTS), dash.no_update,
+                f'{num_agents} agents do not fit into the memory budget')
+
+    with pool.session(session_id) as session:
+        session.replace(new_model(*params), running=not paused)
+    return (*(series_fig(graph_id) for graph_id in CHARTS), None, '')
 
 
 @app.callback(
@@ -647,10 +786,16 @@ def callback_func_reset_interval(button_clicks, *args):
      Output('start-stop-button', 'children'),
      Output('start-stop-button', 'color')],
     [Input('start-stop-button', 'n_clicks')],
-    [State('interval-component', 'disabled')],
+    [State('interval-component', 'disabled'),
+     State('session-id', 'data')],
 )
-def callback_func_start_stop_interval(button_clicks, disabled_state):
+def callback_func_start_stop_interval(button_clicks, disabled_state, session_id):
     if button_clicks is not None and button_clicks > 0:
+        with pool.session(session_id) as session:
+            if disabled_state:
+                session.worker.resume()
+            else:
+                session.worker.pause()
         return (not disabled_state,
                 'Stop' if disabled_state else 'Start',
                 'secondary' if disabled_state else 'primary')
@@ -660,13 +805,18 @@ def callback_func_start_stop_interval(button_clicks, disabled_state):
 
 @app.callback(
     Output('interval-component', 'interval'),
-    [Input('sps-slider', 'value')],
+    [Input('sps-slider', 'value'),
+     Input('fast-forward', 'value')],
+    [State('session-id', 'data')],
 )
-def interval_fps(value):
-    return 1000 / value
-
+def interval_fps(value, fast_forward, session_id):
+    """Set the worker's step rate, charts are redrawn at the same rate
+    but at most 10 times per second in fast-forward.
+    """
+    with pool.session(session_id) as session:
+        session.worker.set_rate(None if fast_forward else value)
+    return 100 if fast_forward else 1000 / value
 
-seed = np.random.seed(0)
 
 if __name__ == '__main__':
     app.run_server(debug=True, host='localhost')
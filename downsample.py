@@ -0,0 +1,106 @@
+import math
+
+
+class MinMaxDownsampler:
+    """Incremental min/max bucketing of a growing series.
+
+    Steps are grouped into buckets of bucket_size consecutive steps and
+    every bucket is drawn as its minimum and maximum, so peaks and troughs
+    survive downsampling. When there are more than budget / 2 complete
+    buckets, neighbouring buckets are merged pairwise and bucket_size
+    doubles, which keeps the number of points below budget at O(1)
+    amortized cost per added value. generation counts the merges: points
+    of complete buckets only change when it does. The incomplete bucket
+    and the latest value are drawn separately by tail().
+    """
+    def __init__(self, budget: int = 1000):
+        self.max_buckets = max(budget // 4 * 2, 2)  # even, for pairwise merges
+        self.bucket_size = 1
+        self.generation = 0
+        self.length = 0
+        # complete buckets as (x of min, min, x of max, max), None if empty
+        self.buckets = []
+        self._partial = None
+        self._partial_count = 0
+        self._last = None
+
+    def extend(self, values):
+        """Add the next values of the series, None and NaN are skipped."""
+        for y in values:
+            x = self.length
+            self.length += 1
+            if y is not None and not math.isnan(y):
+                self._last = (x, y)
+                partial = self._partial
+                if partial is None:
+                    self._partial = (x, y, x, y)
+                elif y < partial[1]:
+                    self._partial = (x, y, partial[2], partial[3])
+                elif y > partial[3]:
+                    self._partial = (partial[0], partial[1], x, y)
+
+            self._partial_count += 1
+            if self._partial_count == self.bucket_size:
+                self.buckets.append(self._partial)
+                self._partial = None
+                self._partial_count = 0
+                if len(self.buckets) > self.max_buckets:
+                    self._merge()
+
+    @staticmethod
+    def _combine(a, b):
+        if a is None or b is None:
+            return a or b
+        low = a if a[1] <= b[1] else b
+        high = a if a[3] >= b[3] else b
+        return (low[0], low[1], high[2], high[3])
+
+    def _merge(self):
+        # an odd trailing bucket already covers its share of the new bucket
+        pairs = len(self.buckets) // 2 * 2
+        merged = [self._combine(self.buckets[i], self.buckets[i + 1])
+                  for i in range(0, pairs, 2)]
+        if pairs < len(self.buckets):
+            self._partial = self._combine(self.buckets[-1], self._partial)
+            self._partial_count += self.bucket_size
+        self.buckets = merged
+        self.bucket_size *= 2
+        self.generation += 1
+
+    @staticmethod
+    def _bucket_points(bucket, xs: list, ys: list):
+        x_min, y_min, x_max, y_max = bucket
+        if x_min == x_max:
+            xs.append(x_min)
+            ys.append(y_min)
+        elif x_min < x_max:
+            xs += [x_min, x_max]
+            ys += [y_min, y_max]
+        else:
+            xs += [x_max, x_min]
+            ys += [y_max, y_min]
+
+    def points(self, start: int = 0) -> tuple[list, list]:
+        """x and y of the points of the complete buckets from start on."""
+        xs, ys = [], []
+        for bucket in self.buckets[start:]:
+            if bucket is not None:
+                self._bucket_points(bucket, xs, ys)
+        return xs, ys
+
+    def tail(self) -> tuple[list, list]:
+        """x and y of the last point of the complete buckets, the points
+        of the incomplete bucket and the latest value, at most four
+        points that continue the line of points() up to now.
+        """
+        xs, ys = [], []
+        last = next((b for b in reversed(self.buckets) if b is not None), None)
+        if last is not None:
+            self._bucket_points(last, xs, ys)
+            del xs[:-1], ys[:-1]
+        if self._partial is not None:
+            self._bucket_points(self._partial, xs, ys)
+        if self._last is not None and (not xs or self._last[0] > xs[-1]):
+            xs.append(self._last[0])
+            ys.append(self._last[1])
+        return xs, ys
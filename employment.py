@@ -0,0 +1,110 @@
+import numpy as np
+
+
+def _total(values):
+    """Sum of an array, or the value itself for a scalar."""
+    return values.sum() if isinstance(values, np.ndarray) else values
+
+
+class EmploymentRegistry:
+    """Employed and unemployed households as one indexed pool.
+
+    Household indices are kept in a single permutation array: the first
+    n_employed entries are the employed households, the rest are the
+    unemployed ones. Every index also knows its position in the pool,
+    so hiring, firing and drawing a random member of either group are
+    all O(1) swaps at the boundary between the two groups.
+    """
+    def __init__(self, size: int, rng: np.random.Generator):
+        self.size = size
+        self.rng = rng
+        self._pool = np.arange(size)
+        self._position = np.arange(size)
+        self.employed = np.zeros(size, dtype=bool)  # employment mask
+        self.n_employed = 0
+
+    @property
+    def n_unemployed(self) -> int:
+        return self.size - self.n_employed
+
+    def employed_ids(self) -> np.ndarray:
+        return self._pool[:self.n_employed]
+
+    def unemployed_ids(self) -> np.ndarray:
+        return self._pool[self.n_employed:]
+
+    def _swap(self, idx: int, pos: int):
+        """Move household idx to position pos of the pool."""
+        other = self._pool[pos]
+        old = self._position[idx]
+        self._pool[pos], self._pool[old] = idx, other
+        self._position[idx], self._position[other] = pos, old
+
+    def hire(self, idx: int):
+        if self.employed[idx]:
+            raise ValueError(f"Household {idx} is already employed")
+        self._swap(idx, self.n_employed)
+        self.n_employed += 1
+        self.employed[idx] = True
+
+    def fire(self, idx: int):
+        if not self.employed[idx]:
+            raise ValueError(f"Household {idx} is not employed")
+        self.n_employed -= 1
+        self._swap(idx, self.n_employed)
+        self.employed[idx] = False
+
+    def random_unemployed(self) -> int:
+        return int(self._pool[self.rng.integers(self.n_employed, self.size)])
+
+    def random_employed(self) -> int:
+        return int(self._pool[self.rng.integers(0, self.n_employed)])
+
+    def hire_random(self) -> int:
+        """Hire a randomly chosen unemployed household and return it."""
+        idx = self.random_unemployed()
+        self.hire(idx)
+        return idx
+
+    def fire_random(self) -> int:
+        """Fire a randomly chosen employed household and return it."""
+        idx = self.random_employed()
+        self.fire(idx)
+        return idx
+
+
+class WageBook:
+    """Wages of the firm's employees as vectors indexed by household.
+
+    productivity holds the productivity of every employee (zero for
+    everyone else) and total_productivity its running sum, which is
+    updated by delta on hires, fires and productivity changes. Wages are
+    base_wage * productivity, so a base-wage change is one vector multiply.
+    """
+    def __init__(self, size: int):
+        self.productivity = np.zeros(size)
+        self.wages = np.zeros(size)
+        self.total_productivity = 0.
+        self.base_wage = 0.
+
+    def set_base_wage(self, base_wage: float):
+        self.base_wage = base_wage
+        np.multiply(self.productivity, base_wage, out=self.wages)
+
+    def add(self, idx, productivity):
+        """Put new employees on the payroll at the current base wage."""
+        self.productivity[idx] = productivity
+        self.wages[idx] = self.base_wage * self.productivity[idx]
+        self.total_productivity += _total(productivity)
+
+    def remove(self, idx):
+        self.total_productivity -= _total(self.productivity[idx])
+        self.productivity[idx] = 0
+        self.wages[idx] = 0
+
+    def update_productivity(self, idx, productivity):
+        """Record new productivity of employees. Their wages follow at the
+        next base-wage change, as the firm only revises wages then.
+        """
+        self.total_productivity += _total(productivity - self.productivity[idx])
+        self.productivity[idx] = productivity
@@ -0,0 +1,268 @@
+"""
+Replica-batched Monte Carlo ensembles of EconomyModel.
+
+An Ensemble steps R independent economies with the same parameters
+together: households are (R x N) arrays and the central bank, bank and
+firm of every replica are length-R vectors, so a step costs one batched
+array pass for all replicas instead of R passes through the model's
+Python code. Every stage follows EconomyModel.step and the agent method
+it is named after.
+
+    ensemble = Ensemble(replicas=200, N=1000, seed=0)
+    for _ in range(500):
+        ensemble.step()
+    results = ensemble.results()  # indexed by (Replica, Step)
+
+Replicas draw from one generator, so they are independent economies but
+their results depend on the number of replicas as well as the seed, and
+they match single models statistically, not value for value.
+"""
+import numpy as np
+import pandas as pd
+
+from agents.household import draw_initial_state
+from config import Config, load_config
+import inequality
+from kernels import ptc_factor, step_households_vectorized
+
+# Model reporters of EconomyModel collected for every replica
+REPORTERS = ('Gini', 'Top 1% Share', 'Top 10% Share', 'Actual Inflation',
+             'Inflation EMA', 'Inflation Expectations', 'Output', 'Demand',
+             'Price', 'CB Rate', 'Unemployment')
+
+
+class Ensemble:
+    """R replicas of an EconomyModel stepped as arrays.
+
+    Household attributes, wages and the employment mask are (R x N)
+    arrays, row r belonging to replica r. Rates, prices, output and the
+    other scalars of the agents are length-R vectors. Parameters are
+    those of EconomyModel and shared by all replicas.
+    """
+    def __init__(self,
+                 replicas: int,
+                 N=None,
+                 r_base=None,
+                 intensity=None,
+                 inf_target=None,
+                 trust=None,
+                 ema_param=None,
+                 seed=None,
+                 config: Config | None = None,
+                 ):
+        config = load_config() if config is None else config
+        config = config.override_model(num_agents=N, r_base=r_base,
+                                       intensity=intensity,
+                                       inf_target=inf_target, trust=trust,
+                                       ema_param=ema_param)
+        self.config = config
+        self.replicas = R = replicas
+        self.num_agents = N = config.model.num_agents
+        self.rng = np.random.default_rng(np.random.SeedSequence(seed))
+        self.steps = 0
+
+        model, bank, firm, hh = (config.model, config.bank, config.firm,
+                                 config.household)
+        self.inf_target = model.inf_target
+        self.ema_param = model.ema_param
+        self.trust = model.trust
+        self.r_base = model.r_base
+        self.intensity = model.intensity
+        self.ltv = bank.ltv
+        self.mu_dep = bank.mu_dep
+        self.mu_loan = bank.mu_loan
+        self.adj_p = firm.adj_p
+        self.nu_2 = firm.nu_2
+        self.firm_sens = firm.sens
+        self.hh = hh
+
+        self.inf_actual = np.zeros(R)
+        self.inf_ema = np.zeros(R)
+        self.inf_expec = np.zeros(R)
+        self.inf_ema_prev = np.zeros(R)
+        self.unemployment = np.zeros(R)
+        # the central bank's rate is unset until its first step
+        self.rate = np.full(R, np.nan)
+        self.r_loan = np.zeros(R)
+        self.r_dep = np.zeros(R)
+        self.prev_price = np.ones(R)
+        self.price = np.ones(R)
+        self.nu_1 = np.full(R, self.nu_2)
+        self.state = np.zeros(R, dtype=bool)
+
+        initial_state = draw_initial_state(self.rng, (R, N), hh)
+        self.ptc = np.full((R, N), float(hh.ptc))
+        self.productivity = initial_state['productivity']
+        self.wealth = initial_state['wealth']
+        self.income = np.zeros((R, N))
+        self.desired_cons = initial_state['desired_cons']
+        self.investment = np.full((R, N), float(hh.inv_cost))
+        self.demand = self.desired_cons.copy()
+        self.employed = np.zeros((R, N), dtype=bool)
+        self.wages = np.zeros((R, N))
+
+        self.agg_demand = self.demand.sum(axis=1)
+        self.output = self.agg_demand.copy()
+        self._init_employment()
+
+        self.history = {name: [] for name in REPORTERS}
+
+    @property
+    def n_employed(self) -> np.ndarray:
+        return self.employed.sum(axis=1)
+
+    @property
+    def total_productivity(self) -> np.ndarray:
+        """Productivity of the employees of every replica, the wage book
+        total of Firm, as employees' wage book productivity always equals
+        their current productivity.
+        """
+        return np.where(self.employed, self.productivity, 0.).sum(axis=1)
+
+    def _choose(self, eligible: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Mask of counts[r] households drawn without replacement from the
+        eligible ones of every replica r, like counts[r] hire_random or
+        fire_random calls of the EmploymentRegistry.
+        """
+        counts = np.minimum(counts, eligible.sum(axis=1))
+        k = counts.max(initial=0)
+        if k == 0:
+            return np.zeros_like(eligible)
+        keys = self.rng.random(eligible.shape)
+        keys[~eligible] = 2
+        smallest = np.partition(keys, k - 1, axis=1)[:, :k]
+        smallest.sort(axis=1)
+        threshold = np.where(counts > 0,
+                             smallest[np.arange(self.replicas), counts - 1], -1)
+        return keys <= threshold[:, None]
+
+    def _hire(self, hired: np.ndarray, base_wage: np.ndarray):
+        self.employed |= hired
+        self.wages[hired] = (base_wage[:, None] * self.productivity)[hired]
+
+    def _init_employment(self):
+        """Firm._init_employment of every replica."""
+        N = self.num_agents
+        n_employed = self.rng.integers(N // 2, N, size=self.replicas)
+        self.base_wage = self.output / n_employed
+        self._hire(self._choose(~self.employed, n_employed), self.base_wage)
+
+    def upd_unemployment(self):
+        self.unemployment = (self.num_agents - self.n_employed) / self.num_agents
+
+    def upd_inflation(self):
+        """EconomyModel.upd_inflation of every replica."""
+        self.inf_expec = self.trust * self.inf_target + (1 - self.trust) * self.inf_actual
+
+        self.inf_actual = (self.price - self.prev_price) / self.prev_price
+
+        if self.steps < 20:
+            self.inf_ema = self.inf_actual
+            self.inf_ema_prev = self.inf_ema_prev + self.inf_actual
+        elif self.steps == 20:
+            self.inf_ema = self.inf_ema_prev / 20
+        else:
+            self.inf_ema = self.ema_param * self.inf_actual + (1 - self.ema_param) * self.inf_ema
+
+    def collect(self):
+        summary = inequality.batch_summary(self.wealth)
+        values = (summary['gini'], summary['top_1'], summary['top_10'],
+                  self.inf_actual, self.inf_ema, self.inf_expec, self.output,
+                  self.agg_demand, self.price, self.rate, self.unemployment)
+        for name, value in zip(REPORTERS, values):
+            self.history[name].append(np.array(value, dtype=float))
+
+    def set_rate(self):
+        """CentralBank.set_rate, the augmented Taylor rule."""
+        self.rate = np.maximum(
+            self.r_base + self.intensity * (self.inf_ema - self.inf_target), 0)
+
+    def update_rates(self):
+        """Bank.update_rates."""
+        self.r_loan = self.rate * (1 + self.mu_loan)
+        self.r_dep = self.rate * (1 - self.mu_dep)
+
+    def step_firm(self):
+        """Firm.step: det_state, upd_workforce, upd_price and upd_output
+        of every replica, replicas with excess demand hire and the others
+        fire.
+        """
+        gap = self.output - self.agg_demand
+        self.state = state = gap <= 0
+
+        # upd_workforce
+        u = self.rng.uniform(0, 1, self.replicas)
+        inflation = 1 + self.firm_sens * self.inf_expec
+        base_wage = self.output / self.total_productivity
+        base_wage *= np.where(
+            state,
+            1 + self.firm_sens * (1 - self.nu_1) * (1 - self.unemployment) * u,
+            1 - self.nu_2 * self.unemployment * u) * inflation
+        self.base_wage = base_wage
+        self.wages = np.where(self.employed, self.productivity, 0.) * base_wage[:, None]
+
+        n_employed = self.n_employed
+        n_to_hire = np.where(
+            state, np.trunc(self.nu_1 * -gap / self.output * n_employed), 0)
+        n_to_fire = np.where(
+            state, 0, np.trunc(self.nu_2 * gap / self.output * n_employed))
+        hired = self._choose(~self.employed,
+                             np.maximum(n_to_hire, 0).astype(np.int64))
+        fired = self._choose(self.employed,
+                             np.maximum(n_to_fire, 0).astype(np.int64))
+        self._hire(hired, base_wage)
+        self.employed &= ~fired
+        self.wages[fired] = 0
+
+        # upd_price
+        self.prev_price = self.price
+        u = self.rng.uniform(0, 1, self.replicas)
+        self.price = self.price * (1 + self.firm_sens * self.inf_expec) * (
+            1 + np.where(state, 1, -1) * self.adj_p * u)
+
+        # upd_output
+        self.nu_1 = np.where(self.n_employed < self.num_agents,
+                             self.rate * self.nu_2, 0)
+        self.output = self.output - np.where(state, self.nu_1, self.nu_2) * gap
+
+    def step_households(self):
+        """HouseholdPopulation.step of every replica."""
+        hh = self.hh
+        cons_shocks = self.rng.standard_normal((self.replicas, self.num_agents))
+        prod_shocks = self.rng.standard_normal((self.replicas, self.num_agents))
+        # employees' wage book productivity is their productivity, so
+        # passing productivity as the wage book's makes its update a no-op
+        self.agg_demand, _, _ = step_households_vectorized(
+            self.ptc, self.productivity, self.wealth, self.income,
+            self.desired_cons, self.investment, self.demand, self.employed,
+            self.wages, self.productivity, cons_shocks, prod_shocks, 0.,
+            hh.mu_k, hh.sigma_k, hh.mu_1, hh.mu_2, hh.sigma, self.ltv,
+            self.r_loan[:, None], self.r_dep[:, None],
+            ptc_factor(hh.sens, self.inf_expec, self.r_dep,
+                       self.prev_price, self.price)[:, None])
+
+    def step(self):
+        """Advance every replica by one step, in the order of
+        EconomyModel.step.
+        """
+        self.upd_unemployment()
+        self.upd_inflation()
+        self.collect()
+        self.set_rate()
+        self.update_rates()
+        self.step_firm()
+        self.step_households()
+        self.steps += 1
+
+    def results(self) -> pd.DataFrame:
+        """Model reporters of all replicas and steps, indexed by
+        (Replica, Step) like EconomyModel's model vars dataframe per
+        replica.
+        """
+        index = pd.MultiIndex.from_product(
+            [range(self.replicas), range(self.steps)],
+            names=['Replica', 'Step'])
+        return pd.DataFrame(
+            {name: np.stack(values, axis=1).ravel() if values else []
+             for name, values in self.history.items()},
+            index=index)
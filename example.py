@@ -1,16 +1,20 @@
+import shutil
+
 from model import EconomyModel
-import numpy as np
+from output import ChunkedWriter, read_output
 
 '''
-An example of how to run the model to get agent reporters as a pd dataframe.
+An example of how to run the model, streaming reporters to disk in chunks,
+and read the agent reporters back as a pd dataframe.
 '''
 
-seed = np.random.seed(0)
-
 if __name__ == '__main__':
-    model = EconomyModel()
+    shutil.rmtree('example_output', ignore_errors=True)
+    model = EconomyModel(seed=0)
+    model.attach_writer(ChunkedWriter('example_output', chunk_steps=10))
     for i in range(50):
         model.step()
+    model.writer.close(model)
 
-    agent_rep = model.datacollector.get_agent_vars_dataframe()
-    agent_rep.to_csv('agent_reporters.csv')
+    model_rep, agent_rep = read_output('example_output')
+    print(agent_rep)
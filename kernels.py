@@ -0,0 +1,198 @@
+"""
+Fused household step kernel of the compiled engine.
+
+step_households runs the whole household pipeline, plan_consumption,
+get_paid, credit_operations, invest, consume, update_wealth and
+update_ptc, for one household after the other in a single loop over the
+population's arrays, with the per-agent semantics and order of
+operations of Household.step. It is compiled with Numba when it is
+installed, otherwise it runs as plain Python, which gives the same
+results but is slow, so without Numba use engine='vectorized'.
+step_households_vectorized does the same with NumPy array operations
+for engine='vectorized', and for the shard workers of engine='sharded'
+when Numba is missing.
+
+Random shocks are not drawn in the kernel: it reads the model's batched
+shock arrays, so the compiled engine uses the model's generator exactly
+like the other engines.
+
+    python kernels.py
+
+checks that the compiled engine matches the object engine.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+NUMBA_AVAILABLE = njit is not None
+
+
+def ptc_factor(sens, inf_expec, r_dep, prev_price, price):
+    """Factor of Household.update_ptc, the same for all households of an
+    economy. Takes arrays of per-economy values as well.
+    """
+    return (1 + sens * (inf_expec - r_dep)) * (1 + 0.01 * (prev_price - price))
+
+
+def _step_households(ptc, productivity, wealth, income, desired_cons,
+                     investment, demand, employed, wages, wage_productivity,
+                     cons_shocks, prod_shocks, total_productivity,
+                     mu_k, sigma_k, mu_1, mu_2, sigma, ltv, r_loan, r_dep,
+                     ptc_factor):
+    """Step every household in place. Returns the total demand, the total
+    wealth and the wage book's updated total productivity.
+    """
+    total_demand = 0.
+    total_wealth = 0.
+    for i in range(len(ptc)):
+        # plan_consumption
+        desired_cons[i] = ptc[i] * income[i] + (mu_k + sigma_k * cons_shocks[i])
+
+        # get_paid
+        if employed[i]:
+            income[i] = wages[i]
+        else:
+            income[i] = 0.
+        wealth[i] += income[i]
+
+        # credit_operations
+        credit_demand = desired_cons[i] + investment[i] - wealth[i]
+        if credit_demand <= 0:
+            interest = - credit_demand * r_dep
+        else:
+            if credit_demand > ltv * wealth[i]:
+                credit_demand -= investment[i]
+                investment[i] = 0.
+                if credit_demand > ltv * wealth[i]:
+                    credit_demand = ltv * wealth[i]
+            interest = - credit_demand * r_loan
+
+        # invest
+        shock = sigma * prod_shocks[i]
+        if investment[i] != 0:
+            productivity[i] *= (1 + mu_1 + shock)
+        else:
+            productivity[i] *= (1 + mu_2 + shock)
+        if employed[i]:
+            total_productivity += productivity[i] - wage_productivity[i]
+            wage_productivity[i] = productivity[i]
+
+        # consume
+        if credit_demand <= 0:
+            demand[i] = desired_cons[i]
+        else:
+            demand[i] = min(desired_cons[i],
+                            wealth[i] + credit_demand + interest - investment[i])
+
+        # update_wealth
+        wealth[i] += interest - demand[i]
+
+        # update_ptc
+        ptc[i] *= ptc_factor
+        if ptc[i] < 0:
+            ptc[i] = 0.
+        elif ptc[i] > 1:
+            ptc[i] = 1.
+
+        total_demand += demand[i]
+        total_wealth += wealth[i]
+    return total_demand, total_wealth, total_productivity
+
+
+step_households = (njit(cache=True)(_step_households) if NUMBA_AVAILABLE
+                   else _step_households)
+
+
+def step_households_vectorized(ptc, productivity, wealth, income,
+                               desired_cons, investment, demand, employed,
+                               wages, wage_productivity, cons_shocks,
+                               prod_shocks, total_productivity, mu_k, sigma_k,
+                               mu_1, mu_2, sigma, ltv, r_loan, r_dep,
+                               ptc_factor):
+    """step_households with one batched NumPy operation per stage instead
+    of a loop over households. Used by engine='vectorized', and by the
+    shard workers of engine='sharded' when Numba is not installed.
+
+    The arrays may also be (R x N), one row per economy, with r_loan,
+    r_dep and ptc_factor (R x 1) columns, as for Ensemble. Demand and
+    wealth totals are then per row.
+    """
+    desired_cons[:] = ptc * income + (mu_k + sigma_k * cons_shocks)
+
+    income[:] = np.where(employed, wages, 0.)
+    wealth += income
+
+    credit_demand = desired_cons + investment - wealth
+    saver = credit_demand <= 0
+    limit = ltv * wealth
+    constrained = ~saver & (credit_demand > limit)
+    credit_demand[constrained] -= investment[constrained]
+    investment[constrained] = 0
+    credit_demand[constrained] = np.minimum(credit_demand[constrained],
+                                            limit[constrained])
+    interest = np.where(saver, -credit_demand * r_dep, -credit_demand * r_loan)
+
+    mu = np.where(investment != 0, mu_1, mu_2)
+    productivity *= (1 + mu + sigma * prod_shocks)
+    total_productivity += (productivity[employed]
+                           - wage_productivity[employed]).sum()
+    wage_productivity[employed] = productivity[employed]
+
+    demand[:] = np.where(
+        credit_demand <= 0,
+        desired_cons,
+        np.minimum(desired_cons,
+                   wealth + credit_demand + interest - investment))
+    wealth += interest - demand
+
+    ptc *= ptc_factor
+    np.clip(ptc, 0, 1, out=ptc)
+    return demand.sum(axis=-1), wealth.sum(axis=-1), total_productivity
+
+
+def check_equivalence(num_agents: int = 1000,
+                      steps: int = 100,
+                      seed: int = 0,
+                      rtol: float = 1e-8
+                      ) -> float:
+    """Run the compiled and the object engine with the same seed and
+    raise AssertionError if any model reporter or household attribute
+    differs by more than rtol. Returns the largest relative difference.
+    """
+    from model import EconomyModel
+
+    models = [EconomyModel(N=num_agents, engine=engine, seed=seed)
+              for engine in ('object', 'compiled')]
+    for _ in range(steps):
+        for model in models:
+            model.step()
+
+    pairs = []
+    reporters = [m.datacollector.get_model_vars_dataframe() for m in models]
+    for column in reporters[0]:
+        pairs.append((column,
+                      reporters[0][column].to_numpy(dtype=float),
+                      reporters[1][column].to_numpy(dtype=float)))
+    for attr in ('ptc', 'productivity', 'wealth', 'income', 'desired_cons',
+                 'investment', 'demand'):
+        pairs.append((attr, *(m.household_values(attr) for m in models)))
+
+    worst = 0.
+    for name, expected, actual in pairs:
+        assert np.array_equal(np.isnan(expected), np.isnan(actual)), name
+        scale = np.maximum(np.abs(expected), 1e-12)
+        diff = np.nan_to_num(np.abs(actual - expected) / scale)
+        worst = max(worst, float(diff.max(initial=0)))
+        assert np.all(diff <= rtol), \
+            f"{name} differs by up to {diff.max():.3g} (rtol {rtol})"
+    return worst
+
+
+if __name__ == '__main__':
+    print(f"Numba {'available' if NUMBA_AVAILABLE else 'not installed, kernel runs as plain Python'}")
+    worst = check_equivalence()
+    print(f'compiled engine matches the object engine, '
+          f'largest relative difference {worst:.3g}')
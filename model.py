@@ -1,13 +1,29 @@
+import copy
+import os
+import warnings
+
 import mesa
-import yaml
+import numpy as np
 
-from agents.household import Household
+from agents.household import Household, draw_initial_state
+from agents.population import HouseholdPopulation
+from agents.sharded import ShardedPopulation
 from agents.central_bank import CentralBank
 from agents.bank import Bank
 from agents.firm import Firm
 
+from aggregates import Aggregates
+from collectors import HouseholdDataCollector, Retention
+from config import Config, load_config
+from employment import EmploymentRegistry
+import inequality
+from kernels import NUMBA_AVAILABLE
+from profiling import STAGES, StepProfiler
+from scheduler import TypeBatchedActivation
 from reporters import (
     compute_gini,
+    compute_top_1_share,
+    compute_top_10_share,
     show_inf_actual,
     show_inf_ema,
     show_inf_expec,
@@ -15,47 +31,145 @@ from reporters import (
     show_demand,
     show_price,
     show_rate,
-    show_unemployment
+    show_unemployment,
+    show_stage_time
 )
 
 
-with open("params.yaml", 'r') as stream:
-    config = yaml.safe_load(stream)
+ENGINES = ('object', 'vectorized', 'compiled', 'sharded')
+# Engines storing households as arrays
+ARRAY_ENGINES = ('vectorized', 'compiled', 'sharded')
+# Agent classes in the order they step
+PHASES = (CentralBank, Bank, Firm, Household, HouseholdPopulation,
+          ShardedPopulation)
+# Model parameters that can change when forking a model
+POLICY_PARAMS = ('r_base', 'intensity', 'inf_target', 'trust', 'ema_param')
+
 
-config_m = config['model']
+def spawn_seeds(seed, n: int) -> list[int]:
+    """Independent seeds for an ensemble of n models, spawned from one
+    SeedSequence so that replicas never share random streams.
+    """
+    return [int(child.generate_state(1, np.uint64)[0])
+            for child in np.random.SeedSequence(seed).spawn(n)]
 
 
 class EconomyModel(mesa.Model):
-    """An economy model with heterogeneous agents."""
+    """An economy model with heterogeneous agents.
+
+    With engine='object' every household is a Household agent, with
+    engine='vectorized' all households are stepped together as arrays
+    by a single HouseholdPopulation. engine='compiled' keeps the arrays
+    but steps them with the fused per-household loop of
+    kernels.step_households, compiled with Numba if it is installed.
+    engine='sharded' keeps the arrays in shared memory and steps them in
+    parallel as shards, by default one per CPU, in worker processes, see
+    agents.sharded.ShardedPopulation. Its
+    shocks come from per-shard generators, so its results match the
+    other engines statistically but not value for value, it cannot be
+    forked or checkpointed, and close() stops its workers.
+
+    Inequality reporters are computed from all households, or from a
+    random sample of inequality_sample households if it is set, see
+    inequality.summary for the error bound of that approximation.
+
+    Household reporters are recorded every agent_every steps, for all
+    households or for the household indices in agent_households only.
+    With a collectors.Retention the collected history is bounded, by
+    default all of it is kept.
+
+    All randomness comes from the model's own generator self.rng, seeded
+    with seed, so models with the same seed give identical results in any
+    thread or process. Use spawn_seeds to seed an ensemble.
+
+    With profile=True the wall time of every stage of step() and of the
+    steps of every agent class is measured, see profiler.metrics(), and
+    with record_profile=True it is also collected as "Time <stage>"
+    model reporters. Without profiling step() is not instrumented.
+
+    Aggregate demand and total wealth are kept up to date by delta in
+    self.aggregates and recomputed exactly every resync_every steps.
+
+    fork() copies a model, e.g. after a burn-in, with other policy
+    parameters.
+
+    Collected data can be streamed to disk with attach_writer, e.g. an
+    output.ChunkedWriter, instead of being kept in memory.
+
+    Parameters come from config, by default params.yaml loaded once with
+    load_config(). Model parameters passed as arguments override the
+    model section, other sections are overridden with Config.override.
+    """
     def __init__(self,
-                 N=config_m['num_agents'],
-                 r_base=config_m['r_base'],
-                 intensity=config_m['intensity'],
-                 inf_target=config_m['inf_target'],
-                 trust=config_m['trust'],
-                 ema_param=config_m['ema_param'],
+                 N=None,
+                 r_base=None,
+                 intensity=None,
+                 inf_target=None,
+                 trust=None,
+                 ema_param=None,
+                 engine='object',
+                 inequality_sample=None,
+                 agent_every=1,
+                 agent_households=None,
+                 retention: Retention | None = None,
+                 profile=False,
+                 record_profile=False,
+                 resync_every=100,
+                 shards=None,
+                 seed=None,
+                 config: Config | None = None,
                  ):
-        self.num_agents = N
-        self.inf_target = inf_target
-        self.ema_param = ema_param
-        self.trust = trust
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+        config = load_config() if config is None else config
+        config = config.override_model(num_agents=N, r_base=r_base,
+                                       intensity=intensity,
+                                       inf_target=inf_target, trust=trust,
+                                       ema_param=ema_param)
+        self.config = config
+
+        self.engine = engine
+        self.vectorized = engine in ARRAY_ENGINES
+        if engine == 'compiled' and not NUMBA_AVAILABLE:
+            warnings.warn("Numba is not installed, the compiled engine runs "
+                          "its kernel as plain Python, which is slow. Use "
+                          "engine='vectorized' instead.", RuntimeWarning)
+        self.num_agents = N = config.model.num_agents
+        self.inf_target = config.model.inf_target
+        self.ema_param = config.model.ema_param
+        self.trust = config.model.trust
+
+        self.inequality_sample = inequality_sample
+        self._inequality = None
+        # the first two children are those of spawn(2), the third seeds
+        # the shards of a sharded population
+        sim_seed, sample_seed, shard_seed = np.random.SeedSequence(seed).spawn(3)
+        self.rng = np.random.default_rng(sim_seed)
+        self._inequality_rng = np.random.default_rng(sample_seed)
 
         self.inf_actual = self.inf_ema = self.inf_expec = self.inf_ema_prev = 0
 
         self.households = []
-        self.unemployed = set()
+        self.cons_shocks = self.prod_shocks = None
+        self.household_ids = np.arange(3, N + 3)
+        self.employment = EmploymentRegistry(N, self.rng)
+        self.aggregates = Aggregates(self, resync_every)
 
         self.unemployment = 0
 
-        self.schedule = mesa.time.StagedActivation(self)
+        self.writer = None
+        self.profiler = StepProfiler() if profile or record_profile else None
+        self.record_profile = record_profile
+
+        self.schedule = TypeBatchedActivation(self, PHASES)
         self.to_kill = []
 
         # Create agents
         cb = CentralBank(unique_id=0,
                          model=self,
-                         r_base=r_base,
-                         intensity=intensity,
-                         inf_target=inf_target
+                         r_base=config.model.r_base,
+                         intensity=config.model.intensity,
+                         inf_target=config.model.inf_target
                          )
         self.schedule.add(cb)
         self.cb = cb
@@ -63,7 +177,7 @@ class EconomyModel(mesa.Model):
         bank = Bank(unique_id=1,
                     model=self,
                     central_bank=cb,
-                    bank_params=config['bank'])
+                    bank_params=config.bank)
         self.schedule.add(bank)
         self.bank = bank
 
@@ -71,27 +185,57 @@ class EconomyModel(mesa.Model):
                     model=self,
                     central_bank=cb,
                     output_0=self.num_agents,
-                    firm_params=config['firm'])
+                    firm_params=config.firm)
         self.schedule.add(firm)
         self.firm = firm
 
-        for i in range(3, self.num_agents+3):
-            a = Household(i,
-                          self,
-                          bank=bank,
-                          firm=firm,
-                          hh_params=config['household'])
-            self.schedule.add(a)
-            self.households.append(a)
-            self.unemployed.add(a)
-
-        self.agg_demand = sum([a.demand for a in self.households])
+        initial_state = draw_initial_state(self.rng,
+                                           self.num_agents,
+                                           config.household)
+        if engine == 'sharded':
+            population = ShardedPopulation(3,
+                                           self,
+                                           num_households=self.num_agents,
+                                           bank=bank,
+                                           firm=firm,
+                                           hh_params=config.household,
+                                           initial_state=initial_state,
+                                           shards=shards or os.cpu_count() or 1,
+                                           seed=shard_seed)
+            self.schedule.add(population)
+            self.households = population
+        elif self.vectorized:
+            population = HouseholdPopulation(3,
+                                             self,
+                                             num_households=self.num_agents,
+                                             bank=bank,
+                                             firm=firm,
+                                             hh_params=config.household,
+                                             initial_state=initial_state,
+                                             compiled=engine == 'compiled')
+            self.schedule.add(population)
+            self.households = population
+        else:
+            for i in range(self.num_agents):
+                a = Household(i + 3,
+                              self,
+                              index=i,
+                              bank=bank,
+                              firm=firm,
+                              hh_params=config.household,
+                              initial_state=initial_state)
+                self.schedule.add(a)
+                self.households.append(a)
+
+        self.aggregates.resync()
+        self.upd_demand()
         firm.output = self.agg_demand
         firm._init_employment()
 
-        self.datacollector = mesa.DataCollector(
-            model_reporters={
+        model_reporters = {
                 "Gini": compute_gini,
+                "Top 1% Share": compute_top_1_share,
+                "Top 10% Share": compute_top_10_share,
                 "Actual Inflation": show_inf_actual,
                 "Inflation EMA": show_inf_ema,
                 "Inflation Expectations": show_inf_expec,
@@ -100,23 +244,52 @@ class EconomyModel(mesa.Model):
                 "Price": show_price,
                 "CB Rate": show_rate,
                 "Unemployment": show_unemployment
-                },
-            agent_reporters={
-                "Wealth":
-                lambda a: a.wealth if a.__class__ == Household else None,
-                "Productivity":
-                lambda a: a.productivity if a.__class__ == Household else None,
-                "Income":
-                lambda a: a.income if a.__class__ == Household else None,
-                "Desired Cons":
-                lambda a: a.desired_cons if a.__class__ == Household else None,
-                "PTC":
-                lambda a: a.ptc if a.__class__ == Household else None
                 }
+        if record_profile:
+            agent_types = dict.fromkeys(type(a).__name__
+                                        for a in self.schedule.agents)
+            for stage in (*STAGES, *agent_types):
+                model_reporters[f"Time {stage}"] = [show_stage_time,
+                                                    [self, stage]]
+        self.datacollector = HouseholdDataCollector(
+            self,
+            model_reporters=model_reporters,
+            agent_reporters={
+                "Wealth": "wealth",
+                "Productivity": "productivity",
+                "Income": "income",
+                "Desired Cons": "desired_cons",
+                "PTC": "ptc"
+                },
+            agent_every=agent_every,
+            agent_households=agent_households,
+            retention=retention
         )
 
+    def household_values(self, attr: str, index=None) -> np.ndarray:
+        """Values of a household attribute for all households, in the
+        order of their ids, or for the households at the given indices,
+        regardless of the engine.
+        """
+        if self.vectorized:
+            values = getattr(self.households, attr)
+            return values if index is None else values[index]
+        households = self.households
+        if index is not None:
+            households = [households[i] for i in index]
+        return np.array([getattr(a, attr) for a in households])
+
+    def inequality(self) -> dict:
+        """Inequality summary of household wealth, computed once per step."""
+        if self._inequality is None or self._inequality[0] != self.schedule.steps:
+            summary = inequality.summary(self.household_values('wealth'),
+                                         sample_size=self.inequality_sample,
+                                         rng=self._inequality_rng)
+            self._inequality = (self.schedule.steps, summary)
+        return self._inequality[1]
+
     def upd_unemployment(self):
-        self.unemployment = len(self.unemployed) / self.num_agents
+        self.unemployment = self.employment.n_unemployed / self.num_agents
 
     def upd_inflation(self):
         # inflation expectations are formed adaptively
@@ -133,12 +306,92 @@ class EconomyModel(mesa.Model):
             self.inf_ema = self.ema_param * self.inf_actual + (1 - self.ema_param) * self.inf_ema
 
     def upd_demand(self):
-        self.agg_demand = sum([a.demand for a in self.households])
+        self.agg_demand = self.aggregates.demand
+
+    def resync_aggregates(self):
+        """Recompute the aggregates exactly when a resync is due."""
+        if self.aggregates.due(self.schedule.steps):
+            self.aggregates.resync()
+
+    def draw_shocks(self):
+        """Draw this step's standard normal consumption and productivity
+        shocks for the whole population at once, household i uses
+        element i of each array. Shard workers draw their own shocks.
+        """
+        if self.engine == 'sharded':
+            return
+        self.cons_shocks = self.rng.standard_normal(self.num_agents)
+        self.prod_shocks = self.rng.standard_normal(self.num_agents)
+
+    def fork(self, seed=None, **params) -> 'EconomyModel':
+        """Copy of the model in its current state with some of the
+        POLICY_PARAMS replaced, e.g. model.fork(intensity=1.2), to run
+        counterfactuals from one burn-in.
+
+        The child continues with a copy of the parent's generators, so
+        forks differ only by their parameters (common random numbers),
+        unless a seed is given. An attached writer is not copied.
+        """
+        unknown = set(params) - set(POLICY_PARAMS)
+        if unknown:
+            raise ValueError(f"Cannot fork with {sorted(unknown)}, "
+                             f"only {POLICY_PARAMS} can change")
+        child = copy.deepcopy(self, memo={id(self.writer): None})
+
+        config = child.config = child.config.override(model=params)
+        child.inf_target = child.cb.inf_target = config.model.inf_target
+        child.ema_param = config.model.ema_param
+        child.trust = config.model.trust
+        child.cb.r_base = config.model.r_base
+        child.cb.intensity = config.model.intensity
+
+        if seed is not None:
+            sim_seed, sample_seed = np.random.SeedSequence(seed).spawn(2)
+            # the generators are shared with e.g. the employment registry,
+            # so they are reseeded in place
+            child.rng.bit_generator.state = \
+                np.random.default_rng(sim_seed).bit_generator.state
+            child._inequality_rng.bit_generator.state = \
+                np.random.default_rng(sample_seed).bit_generator.state
+        return child
+
+    def close(self):
+        """Stop the shard workers of a sharded model and free its shared
+        memory. Other engines hold no such resources.
+        """
+        if self.engine == 'sharded':
+            self.households.close()
+
+    def attach_writer(self, writer):
+        """Hand collected data to writer after every step, the writer
+        decides when to drain the data collector.
+        """
+        self.writer = writer
 
     def step(self):
         """Advance the model by one step."""
+        if self.profiler is not None:
+            return self._profiled_step()
+        self.draw_shocks()
         self.upd_unemployment()
         self.upd_inflation()
+        self.resync_aggregates()
         self.upd_demand()
         self.datacollector.collect(self)
+        if self.writer is not None:
+            self.writer.write(self)
         self.schedule.step()
+
+    def _profiled_step(self):
+        """step() with every stage timed by self.profiler."""
+        time = self.profiler.time
+        time('draw_shocks', self.draw_shocks)
+        time('upd_unemployment', self.upd_unemployment)
+        time('upd_inflation', self.upd_inflation)
+        time('resync', self.resync_aggregates)
+        time('upd_demand', self.upd_demand)
+        time('collect', self.datacollector.collect, self)
+        if self.writer is not None:
+            time('write', self.writer.write, self)
+        time('schedule', self.profiler.run_schedule, self.schedule)
+        self.profiler.end_step()
@@ -0,0 +1,122 @@
+"""
+Streaming output of collected model and household series.
+
+A ChunkedWriter attached to an EconomyModel drains the model's data
+collector every chunk_steps steps into a compressed .npz file in its
+directory, so memory stays bounded however long the model runs and a
+crash loses at most one chunk:
+
+    model = EconomyModel(seed=0)
+    model.attach_writer(ChunkedWriter('run_output', chunk_steps=100))
+    for _ in range(10_000):
+        model.step()
+    model.writer.close(model)
+
+Chunks are written to a temporary file and renamed when complete, so
+read_output returns the steps written so far even while the run is
+still going. Every chunk holds
+
+    model.Step          steps of the model reporter values, (n,)
+    model.<reporter>    model reporter values, (n,)
+    agent.Step          steps of the household records, (m,)
+    agent.AgentID       ids of the recorded households, (k,)
+    agent.<reporter>    household reporter values, (m, k)
+
+or, for a collector with summary retention, agent.Statistic with the k
+statistic names in place of agent.AgentID.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+CHUNK_PATTERN = 'chunk_{:06d}.npz'
+
+
+class ChunkedWriter:
+    """Writes the data collected by a model to numbered .npz chunks.
+
+    For a collector with a Retention, chunk_steps should not exceed its
+    window, or older steps of a chunk are written thinned out.
+    """
+    def __init__(self, directory: str, chunk_steps: int = 100):
+        self.directory = directory
+        self.chunk_steps = chunk_steps
+        self.n_chunks = 0
+        self._pending = 0
+        os.makedirs(directory, exist_ok=True)
+        if chunk_files(directory):
+            raise ValueError(f'{directory} already contains output chunks')
+
+    def write(self, model):
+        """Called by the model after every collection, flushes a chunk
+        once chunk_steps steps are pending.
+        """
+        self._pending += 1
+        if self._pending >= self.chunk_steps:
+            self.flush(model)
+
+    def flush(self, model):
+        """Write everything collected since the last chunk."""
+        data = model.datacollector.drain()
+        self._pending = 0
+        if not len(data['model.Step']) and not len(data['agent.Step']):
+            return
+
+        path = os.path.join(self.directory, CHUNK_PATTERN.format(self.n_chunks))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.n_chunks += 1
+
+    def close(self, model):
+        """Write the last, possibly incomplete chunk."""
+        self.flush(model)
+
+
+def chunk_files(directory: str) -> list[str]:
+    """Complete chunk files in a directory, in the order they were written."""
+    return sorted(glob.glob(os.path.join(directory, 'chunk_*.npz')))
+
+
+def read_output(directory: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Model and household reporters of all complete chunks, as the data
+    collector's get_model_vars_dataframe and get_agent_vars_dataframe
+    would have returned them.
+    """
+    model_frames, agent_frames = [], []
+    for path in chunk_files(directory):
+        with np.load(path) as chunk:
+            model_frames.append(pd.DataFrame(
+                {key[6:]: chunk[key] for key in chunk.files
+                 if key.startswith('model.') and key != 'model.Step'},
+                index=pd.Index(chunk['model.Step'], name='Step')))
+
+            steps = chunk['agent.Step']
+            names = [key[6:] for key in chunk.files if key.startswith('agent.')
+                     and key not in ('agent.Step', 'agent.AgentID',
+                                     'agent.Statistic')]
+            if 'agent.Statistic' in chunk.files:
+                columns = pd.MultiIndex.from_product(
+                    [names, chunk['agent.Statistic']],
+                    names=[None, 'Statistic'])
+                agent_frames.append(pd.DataFrame(
+                    np.hstack([chunk['agent.' + name] for name in names]),
+                    index=pd.Index(steps, name='Step'), columns=columns))
+                continue
+
+            ids = chunk['agent.AgentID']
+            index = pd.MultiIndex.from_arrays(
+                [np.repeat(steps, len(ids)), np.tile(ids, len(steps))],
+                names=['Step', 'AgentID'])
+            agent_frames.append(pd.DataFrame(
+                {name: chunk['agent.' + name].ravel() for name in names},
+                index=index))
+
+    if not model_frames:
+        return pd.DataFrame(), pd.DataFrame()
+    return pd.concat(model_frames), pd.concat(agent_frames)
@@ -0,0 +1,47 @@
+import time
+from collections import defaultdict
+
+# Stages of EconomyModel.step, agent steps are timed per agent class
+# within 'schedule'
+STAGES = ('draw_shocks', 'upd_unemployment', 'upd_inflation', 'resync',
+          'upd_demand', 'collect', 'write', 'schedule')
+
+
+class StepProfiler:
+    """Wall time of the stages of EconomyModel.step.
+
+    total holds the cumulative seconds of every stage and last the
+    seconds of the latest step. Agent steps are timed per phase of the
+    schedule, e.g. 'Firm', so there are only a few clock reads per step
+    however many agents there are.
+    """
+    def __init__(self):
+        self.total = defaultdict(float)
+        self.last = {}
+        self.steps = 0
+
+    def time(self, stage: str, func, *args):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        self.total[stage] += elapsed
+        self.last[stage] = elapsed
+
+    def end_step(self):
+        self.steps += 1
+
+    def run_schedule(self, schedule):
+        """Run one step of a TypeBatchedActivation, like its step(), and
+        time every phase by its agent class.
+        """
+        for phase in schedule.phases:
+            if schedule.batch(phase):
+                self.time(phase.__name__, schedule.step_phase, phase)
+        schedule.finish_step()
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        """Cumulative, mean and latest seconds per step of every stage."""
+        return {stage: {'total_s': total,
+                        'mean_s': total / max(self.steps, 1),
+                        'last_s': self.last[stage]}
+                for stage, total in self.total.items()}
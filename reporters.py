@@ -1,9 +1,13 @@
 def compute_gini(model):
-    agent_wealths = [agent.wealth for agent in model.households]
-    x = sorted(agent_wealths)
-    N = len(model.households)
-    B = sum(xi * (N - i) for i, xi in enumerate(x)) / (N * sum(x))
-    return 1 + (1 / N) - 2 * B
+    return model.inequality()['gini']
+
+
+def compute_top_1_share(model):
+    return model.inequality()['top_1']
+
+
+def compute_top_10_share(model):
+    return model.inequality()['top_10']
 
 
 def show_inf_actual(model):
@@ -36,3 +40,10 @@ def show_rate(model):
 
 def show_unemployment(model):
     return model.unemployment
+
+
+def show_stage_time(model, stage):
+    """Seconds the stage took the last time it ran, for collect and later
+    stages that is in the previous step.
+    """
+    return model.profiler.last.get(stage, 0.)
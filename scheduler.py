@@ -0,0 +1,54 @@
+import mesa
+
+
+class TypeBatchedActivation(mesa.time.BaseScheduler):
+    """Activates agents by type in an explicit phase order.
+
+    phases lists agent classes in the order they step, e.g. central bank
+    before bank before firm before households. Agents are grouped by
+    phase when they are added. Every step each phase is dispatched once:
+    with the class's step_batch(agents) if it defines one, otherwise by
+    calling step() on its agents in the order they were added.
+    """
+    def __init__(self, model: mesa.Model, phases):
+        super().__init__(model)
+        self.phases = tuple(phases)
+        self._batches = {phase: [] for phase in self.phases}
+
+    def _phase(self, agent: mesa.Agent):
+        for phase in self.phases:
+            if isinstance(agent, phase):
+                return phase
+        raise ValueError(f"{type(agent).__name__} is not in any phase of "
+                         f"the schedule {[p.__name__ for p in self.phases]}")
+
+    def add(self, agent: mesa.Agent) -> None:
+        phase = self._phase(agent)
+        super().add(agent)
+        self._batches[phase].append(agent)
+
+    def remove(self, agent: mesa.Agent) -> None:
+        super().remove(agent)
+        self._batches[self._phase(agent)].remove(agent)
+
+    def batch(self, phase) -> list[mesa.Agent]:
+        """Agents of a phase, in the order they step."""
+        return self._batches[phase]
+
+    def step_phase(self, phase):
+        agents = self._batches[phase]
+        step_batch = getattr(phase, 'step_batch', None)
+        if step_batch is not None:
+            step_batch(agents)
+        else:
+            for agent in agents:
+                agent.step()
+
+    def finish_step(self):
+        self.steps += 1
+        self.time += 1
+
+    def step(self) -> None:
+        for phase in self.phases:
+            self.step_phase(phase)
+        self.finish_step()
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from model import EconomyModel
+from worker import SimulationWorker
+
+# Approximate memory of one household while stepping, in bytes
+HOUSEHOLD_BYTES = {'object': 600, 'vectorized': 200, 'compiled': 200,
+                   'sharded': 200}
+# Approximate memory of one collected model reporter value
+REPORTER_VALUE_BYTES = 32
+
+
+def estimate_model_bytes(num_agents: int, engine: str = 'object') -> int:
+    """Memory a new model with num_agents households will need."""
+    return num_agents * HOUSEHOLD_BYTES[engine]
+
+
+def model_bytes(model: EconomyModel) -> int:
+    """Approximate current memory of a model, including its history."""
+    datacollector = model.datacollector
+    history = datacollector.agent_history.nbytes
+    if datacollector.model_history is not None:
+        history += datacollector.model_history.nbytes
+    reporters = sum(len(values) for values in datacollector.model_vars.values())
+    return (estimate_model_bytes(model.num_agents, model.engine)
+            + history + reporters * REPORTER_VALUE_BYTES)
+
+
+class Session:
+    """A user's simulation worker, guarded by its own lock, and view state
+    derived from its model that the UI keeps between callbacks.
+    """
+    def __init__(self, worker: SimulationWorker):
+        self.worker = worker
+        self.view = {}
+        self.lock = threading.Lock()
+        self.last_access = time.monotonic()
+
+    def replace(self, model: EconomyModel, running: bool):
+        """Swap in a new model, keeping the worker's step rate."""
+        self.worker.stop()
+        self.worker.model.close()
+        self.worker = SimulationWorker(
+            model, steps_per_second=self.worker.steps_per_second)
+        self.view = {}
+        if running:
+            self.worker.resume()
+
+
+class SessionPool:
+    """Simulation workers keyed by session id.
+
+    A session is created with make_model() on first access. Sessions not
+    accessed for idle_timeout seconds are evicted, and while the models
+    together need more than memory_budget bytes the least recently used
+    sessions are evicted. Evicted workers are stopped and their models
+    closed and freed. Each session has its own lock, so callbacks of one
+    user never see a half-replaced model while other users are not
+    blocked.
+    """
+    def __init__(self,
+                 make_model: Callable[[], EconomyModel],
+                 memory_budget: int,
+                 idle_timeout: float
+                 ):
+        self.make_model = make_model
+        self.memory_budget = memory_budget
+        self.idle_timeout = idle_timeout
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def fits(self, num_agents: int, engine: str = 'object') -> bool:
+        """Whether a model of this size fits into the budget on its own."""
+        return estimate_model_bytes(num_agents, engine) <= self.memory_budget
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Session]:
+        with self._lock:
+            evicted = self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(SimulationWorker(self.make_model()))
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_access = time.monotonic()
+            evicted += self._enforce_budget()
+
+        # stopping waits for a step in progress, which must not block
+        # other users' sessions
+        for old in evicted:
+            with old.lock:
+                old.worker.stop()
+                old.worker.model.close()
+
+        with session.lock:
+            yield session
+
+    def _evict_idle(self) -> list[Session]:
+        now = time.monotonic()
+        return [self._sessions.pop(session_id)
+                for session_id, session in list(self._sessions.items())
+                if now - session.last_access > self.idle_timeout]
+
+    def _enforce_budget(self) -> list[Session]:
+        """Evict least recently used sessions until the rest fit, the most
+        recently used one is always kept.
+        """
+        usage = {session_id: model_bytes(session.worker.model)
+                 for session_id, session in self._sessions.items()}
+        total = sum(usage.values())
+        evicted = []
+        for session_id in list(self._sessions)[:-1]:
+            if total <= self.memory_budget:
+                break
+            total -= usage[session_id]
+            evicted.append(self._sessions.pop(session_id))
+        return evicted
@@ -0,0 +1,205 @@
+"""
+Parallel parameter sweeps over EconomyModel.
+
+Every combination of the parameter grid is run for a number of replicas
+(seeds spawned from one base seed) on a process pool. Every model has
+its own random generator, so results do not depend on which worker ran
+them or in which order. Model reporter series of finished runs are
+appended to one results table, results.csv in the output directory, and
+the id of every run is added to completed.txt only after its rows are on
+disk, so a sweep that crashed or was interrupted is resumed by running
+the same command again.
+
+    python sweep.py grid.yaml --replicas 20 --steps 500 --output sweeps/policy
+
+where grid.yaml maps EconomyModel arguments, or section.parameter names
+of params.yaml, to lists of values, e.g.
+
+    r_base: [0, 0.02, 0.05]
+    intensity: [0.4, 0.8, 1.2]
+    N: [1000]
+    bank.ltv: [0.5, 0.7]
+
+The config is loaded once in the parent process and sent to the workers
+with every task, so they do not read params.yaml. Run ids hash the
+parameters, seed, number of steps and config, so resuming with other
+--steps or an edited params.yaml runs everything again instead of mixing
+the results.
+
+With --early-stop runs end when they converge or diverge, and with
+--time-budget when they ran for that many seconds, see controller.py.
+The reason and step at which every run stopped are added to its rows as
+stop_reason and stop_step, 'max steps' and the last step for runs
+without these options, so every sweep writes the same columns.
+"""
+import argparse
+import dataclasses
+import hashlib
+import itertools
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import pandas as pd
+import yaml
+
+from config import Config, load_config
+from controller import Converged, Diverged, RunController, WallClock
+from model import EconomyModel, spawn_seeds
+
+RESULTS_FILE = 'results.csv'
+COMPLETED_FILE = 'completed.txt'
+
+
+def param_grid(grid: dict[str, list]) -> list[dict]:
+    """All combinations of the values in the grid."""
+    names = sorted(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(grid[n] for n in names))]
+
+
+def run_id(params: dict, seed: int, steps: int, config: Config) -> str:
+    """Stable id of a run, independent of the order of the grid. Runs of
+    another length or with another config get other ids, so they are
+    not taken for completed when resuming.
+    """
+    key = json.dumps({'params': params, 'seed': seed, 'steps': steps,
+                      'config': dataclasses.asdict(config)}, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def stopping_criteria(early_stop: bool = False,
+                      time_budget: float | None = None) -> list:
+    criteria = [Converged(), Diverged()] if early_stop else []
+    if time_budget is not None:
+        criteria.append(WallClock(time_budget))
+    return criteria
+
+
+def run_model(task: tuple[str, dict, int, int, Config, bool, float | None]
+              ) -> pd.DataFrame:
+    """Run one model and return its model reporter series together with
+    the run id, parameters and seed, and why and when it stopped.
+    """
+    rid, params, seed, steps, config, early_stop, time_budget = task
+    kwargs, sections = {}, {}
+    for name, value in params.items():
+        if '.' in name:
+            section, param = name.split('.', 1)
+            sections.setdefault(section, {})[param] = value
+        else:
+            kwargs[name] = value
+
+    model = EconomyModel(**kwargs,
+                         agent_households=[],
+                         seed=seed,
+                         config=config.override(**sections))
+    criteria = stopping_criteria(early_stop, time_budget)
+    controller = RunController(model, criteria)
+    controller.run(steps)
+
+    df = model.datacollector.get_model_vars_dataframe()
+    df.index.name = 'Step'
+    df = df.reset_index()
+    df['stop_reason'] = controller.stop_reason
+    df['stop_step'] = controller.stop_step
+    for name, value in params.items():
+        df.insert(0, name, value)
+    df.insert(0, 'seed', seed)
+    df.insert(0, 'run_id', rid)
+    return df
+
+
+def _completed_runs(output_dir: str) -> set[str]:
+    """Ids of completed runs. Rows of runs that were being written when
+    a previous sweep stopped are dropped from the results table.
+    """
+    completed_path = os.path.join(output_dir, COMPLETED_FILE)
+    results_path = os.path.join(output_dir, RESULTS_FILE)
+    completed = set()
+    if os.path.exists(completed_path):
+        with open(completed_path) as f:
+            completed = {line.strip() for line in f if line.strip()}
+
+    if os.path.exists(results_path):
+        results = pd.read_csv(results_path, usecols=['run_id'])
+        if not results['run_id'].isin(completed).all():
+            results = pd.read_csv(results_path)
+            results = results[results['run_id'].isin(completed)]
+            tmp_path = results_path + '.tmp'
+            results.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, results_path)
+    return completed
+
+
+def sweep(grid: dict[str, list],
+          replicas: int,
+          steps: int,
+          output_dir: str,
+          processes: int | None = None,
+          seed: int = 0,
+          config: Config | None = None,
+          early_stop: bool = False,
+          time_budget: float | None = None
+          ) -> str:
+    """Run every point of the grid for replicas seeds spawned from seed
+    and return the path of the consolidated results table.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, RESULTS_FILE)
+    completed_path = os.path.join(output_dir, COMPLETED_FILE)
+    completed = _completed_runs(output_dir)
+    config = load_config() if config is None else config
+
+    tasks = []
+    for params in param_grid(grid):
+        for replica_seed in spawn_seeds(seed, replicas):
+            rid = run_id(params, replica_seed, steps, config)
+            if rid not in completed:
+                tasks.append((rid, params, replica_seed, steps, config,
+                              early_stop, time_budget))
+
+    n_total = len(param_grid(grid)) * replicas
+    print(f'{n_total - len(tasks)} of {n_total} runs already completed')
+
+    start = time.perf_counter()
+    with Pool(processes) as pool, \
+            open(completed_path, 'a') as completed_file:
+        for i, df in enumerate(pool.imap_unordered(run_model, tasks), 1):
+            header = not os.path.exists(results_path)
+            with open(results_path, 'a') as results_file:
+                df.to_csv(results_file, header=header, index=False)
+                results_file.flush()
+                os.fsync(results_file.fileno())
+            completed_file.write(df['run_id'].iat[0] + '\n')
+            completed_file.flush()
+
+            rate = i / (time.perf_counter() - start) * 60
+            print(f'{i}/{len(tasks)} runs, {rate:.1f} runs/min')
+    return results_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('grid', help='YAML file mapping EconomyModel '
+                        'arguments to lists of values')
+    parser.add_argument('--replicas', type=int, default=10)
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--output', default='sweep_results')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of worker processes, all cores by default')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--early-stop', action='store_true',
+                        help='stop runs that converged or diverged')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='wall clock seconds per run')
+    args = parser.parse_args()
+
+    with open(args.grid) as stream:
+        grid = yaml.safe_load(stream)
+    sweep(grid, args.replicas, args.steps, args.output,
+          processes=args.processes, seed=args.seed,
+          early_stop=args.early_stop, time_budget=args.time_budget)
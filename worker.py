@@ -0,0 +1,63 @@
+import threading
+import time
+
+from model import EconomyModel
+
+
+class SimulationWorker:
+    """Steps an EconomyModel in a background thread.
+
+    The worker runs at steps_per_second, or as fast as possible when it is
+    None (fast-forward). After every step it publishes the number of
+    collected steps in published_steps. Readers such as the dashboard only
+    look at model reporter values up to published_steps, which are never
+    modified afterwards, so they need no lock and never wait for a step.
+    """
+    def __init__(self, model: EconomyModel, steps_per_second=1.0):
+        self.model = model
+        self.steps_per_second = steps_per_second
+        self.published_steps = 0
+        self._running = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    def resume(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def stop(self):
+        """Stop the thread for good, e.g. when the model is replaced.
+        Returns once a step in progress has finished, so the model can be
+        closed afterwards.
+        """
+        self._stopped.set()
+        self._running.set()  # wake the thread up so it can exit
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def set_rate(self, steps_per_second):
+        """Target steps per second, None to step as fast as possible."""
+        self.steps_per_second = steps_per_second
+
+    def _run(self):
+        next_step = time.perf_counter()
+        while True:
+            self._running.wait()
+            if self._stopped.is_set():
+                return
+
+            self.model.step()
+            self.published_steps = self.model.schedule.steps
+
+            if self.steps_per_second:
+                now = time.perf_counter()
+                next_step = max(next_step + 1 / self.steps_per_second, now)
+                time.sleep(next_step - now)